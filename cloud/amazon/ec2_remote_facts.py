@@ -26,6 +26,20 @@ options:
       - A dict of filters to apply. Each dict item consists of a filter key and a filter value. See U(http://docs.aws.amazon.com/AWSEC2/latest/APIReference/API_DescribeInstances.html) for possible filters.
     required: false
     default: null
+  attributes:
+    description:
+      - A list of instance keys to return, for example C(id), C(tags) and C(private_ip_address). Only these keys are built for each instance.
+        All keys are returned when omitted.
+    required: false
+    default: null
+    version_added: "2.1"
+  page_size:
+    description:
+      - Number of instances to request per DescribeInstances call. Each page is reduced to the requested attributes before the next page is fetched.
+        Must be between 5 and 1000.
+    required: false
+    default: 1000
+    version_added: "2.1"
 author:
     - "Michael Schuett (@michaeljs1990)"
 extends_documentation_fragment:
@@ -50,6 +64,15 @@ EXAMPLES = '''
     filters:
       instance-id: i-123456
 
+# Gather only the id, private IP and tags of all running instances
+- ec2_remote_facts:
+    filters:
+      instance-state-name: running
+    attributes:
+      - id
+      - private_ip_address
+      - tags
+
 # Gather facts about all instances in vpc-123456 that are t2.small type
 - ec2_remote_facts:
     filters:
@@ -65,57 +88,72 @@ try:
 except ImportError:
     HAS_BOTO = False
 
-def get_instance_info(instance):
-
-    # Get groups
+def get_groups(instance):
     groups = []
     for group in instance.groups:
         groups.append({ 'id': group.id, 'name': group.name }.copy())
+    return groups
+
 
-    # Get interfaces
+def get_interfaces(instance):
     interfaces = []
     for interface in instance.interfaces:
         interfaces.append({ 'id': interface.id, 'mac_address': interface.mac_address }.copy())
+    return interfaces
 
+
+def get_source_dest_check(instance):
     # If an instance is terminated, sourceDestCheck is no longer returned
     try:
-        source_dest_check = instance.sourceDestCheck
+        return instance.sourceDestCheck
     except AttributeError:
-        source_dest_check = None
-
-    instance_info = { 'id': instance.id,
-                    'kernel': instance.kernel,
-                    'instance_profile': instance.instance_profile,
-                    'root_device_type': instance.root_device_type,
-                    'private_dns_name': instance.private_dns_name,
-                    'public_dns_name': instance.public_dns_name,
-                    'ebs_optimized': instance.ebs_optimized,
-                    'client_token': instance.client_token,
-                    'virtualization_type': instance.virtualization_type,
-                    'architecture': instance.architecture,
-                    'ramdisk': instance.ramdisk,
-                    'tags': instance.tags,
-                    'key_name': instance.key_name,
-                    'source_destination_check': source_dest_check,
-                    'image_id': instance.image_id,
-                    'groups': groups,
-                    'interfaces': interfaces,
-                    'spot_instance_request_id': instance.spot_instance_request_id,
-                    'requester_id': instance.requester_id,
-                    'monitoring_state': instance.monitoring_state,
-                    'placement': {
-                                  'tenancy': instance._placement.tenancy,
-                                  'zone': instance._placement.zone
-                                 },
-                    'ami_launch_index': instance.ami_launch_index,
-                    'launch_time': instance.launch_time,
-                    'hypervisor': instance.hypervisor,
-                    'region': instance.region.name,
-                    'persistent': instance.persistent,
-                    'private_ip_address': instance.private_ip_address,
-                    'state': instance._state.name,
-                    'vpc_id': instance.vpc_id,
-                  }
+        return None
+
+
+INSTANCE_ATTRIBUTES = {
+    'id': lambda instance: instance.id,
+    'kernel': lambda instance: instance.kernel,
+    'instance_profile': lambda instance: instance.instance_profile,
+    'root_device_type': lambda instance: instance.root_device_type,
+    'private_dns_name': lambda instance: instance.private_dns_name,
+    'public_dns_name': lambda instance: instance.public_dns_name,
+    'ebs_optimized': lambda instance: instance.ebs_optimized,
+    'client_token': lambda instance: instance.client_token,
+    'virtualization_type': lambda instance: instance.virtualization_type,
+    'architecture': lambda instance: instance.architecture,
+    'ramdisk': lambda instance: instance.ramdisk,
+    'tags': lambda instance: instance.tags,
+    'key_name': lambda instance: instance.key_name,
+    'source_destination_check': get_source_dest_check,
+    'image_id': lambda instance: instance.image_id,
+    'groups': get_groups,
+    'interfaces': get_interfaces,
+    'spot_instance_request_id': lambda instance: instance.spot_instance_request_id,
+    'requester_id': lambda instance: instance.requester_id,
+    'monitoring_state': lambda instance: instance.monitoring_state,
+    'placement': lambda instance: {
+                                   'tenancy': instance._placement.tenancy,
+                                   'zone': instance._placement.zone
+                                  },
+    'ami_launch_index': lambda instance: instance.ami_launch_index,
+    'launch_time': lambda instance: instance.launch_time,
+    'hypervisor': lambda instance: instance.hypervisor,
+    'region': lambda instance: instance.region.name,
+    'persistent': lambda instance: instance.persistent,
+    'private_ip_address': lambda instance: instance.private_ip_address,
+    'state': lambda instance: instance._state.name,
+    'vpc_id': lambda instance: instance.vpc_id,
+}
+
+
+def get_instance_info(instance, attributes=None):
+
+    if attributes is None:
+        attributes = INSTANCE_ATTRIBUTES.keys()
+
+    instance_info = {}
+    for attribute in attributes:
+        instance_info[attribute] = INSTANCE_ATTRIBUTES[attribute](instance)
 
     return instance_info
 
@@ -123,15 +161,32 @@ def get_instance_info(instance):
 def list_ec2_instances(connection, module):
 
     filters = module.params.get("filters")
+    attributes = module.params.get("attributes")
+    page_size = module.params.get("page_size")
     instance_dict_array = []
 
-    try:
-        all_instances = connection.get_only_instances(filters=filters)
-    except BotoServerError as e:
-        module.fail_json(msg=e.message)
+    if attributes is not None:
+        unknown = [a for a in attributes if a not in INSTANCE_ATTRIBUTES]
+        if unknown:
+            module.fail_json(msg="Unknown attributes: %s. Valid attributes are: %s" % (', '.join(unknown), ', '.join(sorted(INSTANCE_ATTRIBUTES.keys()))))
 
-    for instance in all_instances:
-        instance_dict_array.append(get_instance_info(instance))
+    # Fetch one page of reservations at a time and keep only the
+    # projected dicts, so the boto objects of a page can be released
+    # before the next one is requested
+    next_token = None
+    while True:
+        try:
+            reservations = connection.get_all_reservations(filters=filters, max_results=page_size, next_token=next_token)
+        except BotoServerError as e:
+            module.fail_json(msg=e.message)
+
+        for reservation in reservations:
+            for instance in reservation.instances:
+                instance_dict_array.append(get_instance_info(instance, attributes))
+
+        next_token = reservations.next_token
+        if not next_token:
+            break
 
     module.exit_json(instances=instance_dict_array)
 
@@ -140,7 +195,9 @@ def main():
     argument_spec = ec2_argument_spec()
     argument_spec.update(
         dict(
-            filters = dict(default=None, type='dict')
+            filters = dict(default=None, type='dict'),
+            attributes = dict(default=None, type='list'),
+            page_size = dict(default=1000, type='int'),
         )
     )
 
@@ -149,6 +206,9 @@ def main():
     if not HAS_BOTO:
         module.fail_json(msg='boto required for this module')
 
+    if not 5 <= module.params.get('page_size') <= 1000:
+        module.fail_json(msg='page_size must be between 5 and 1000')
+
     region, ec2_url, aws_connect_params = get_aws_connection_info(module)
 
     if region:
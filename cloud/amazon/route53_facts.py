@@ -112,6 +112,28 @@ options:
         'tags',
         ]
     default: 'list'
+  paginate:
+    description:
+      - "Used with query: record_sets and query: hosted_zone with
+        hosted_zone_method: list. If true, every page is fetched with a boto3
+        paginator and the results are returned as one list, without per-page
+        metadata. max_items sets the page size, and next_marker is ignored."
+    required: false
+    default: false
+    version_added: "2.1"
+  name_filter:
+    description:
+      - "Shell-style glob matched against record set or hosted zone names,
+        applied while paging. Only used when paginate is true. The trailing
+        dot of a name is optional in the pattern."
+    required: false
+    version_added: "2.1"
+  type_filter:
+    description:
+      - "List of record types to keep, applied while paging. Only used with
+        query: record_sets when paginate is true."
+    required: false
+    version_added: "2.1"
 author: Karen Cheng(@Etherdaemon)
 extends_documentation_fragment: aws
 '''
@@ -138,6 +160,15 @@ EXAMPLES = '''
     max_items: 20
   register: record_sets
 
+- name: List every A and CNAME record under www in a zone, across all pages
+  route53_facts:
+    query: record_sets
+    hosted_zone_id: 'ZZZ1111112222'
+    paginate: true
+    name_filter: 'www*.example.com'
+    type_filter: ['A', 'CNAME']
+  register: record_sets
+
 - name: List first 20 health checks
   route53_facts:
     query: health_check
@@ -173,6 +204,8 @@ try:
 except ImportError:
     HAS_BOTO3 = False
 
+import fnmatch
+
 
 def get_hosted_zone(client, module):
     params = dict()
@@ -203,9 +236,40 @@ def reusable_delegation_set_details(client, module):
     return results
 
 
+def name_matches(module, name):
+    pattern = module.params.get('name_filter')
+    if not pattern:
+        return True
+    return fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(name.rstrip('.'), pattern)
+
+
+def paginate(client, module, operation, key, params, match):
+    pagination_config = dict()
+    if module.params.get('max_items'):
+        pagination_config['PageSize'] = module.params.get('max_items')
+
+    items = []
+    paginator = client.get_paginator(operation)
+    for page in paginator.paginate(PaginationConfig=pagination_config, **params):
+        for item in page.get(key, []):
+            if match(item):
+                items.append(item)
+
+    results = dict()
+    results[key] = items
+    results['IsTruncated'] = False
+    return results
+
+
 def list_hosted_zones(client, module):
     params = dict()
 
+    if module.params.get('paginate'):
+        if module.params.get('delegation_set_id'):
+            params['DelegationSetId'] = module.params.get('delegation_set_id')
+        return paginate(client, module, 'list_hosted_zones', 'HostedZones', params,
+                        lambda zone: name_matches(module, zone['Name']))
+
     if module.params.get('max_items'):
         params['MaxItems'] = module.params.get('max_items')
 
@@ -325,6 +389,16 @@ def record_sets_details(client, module):
     elif module.params.get('type'):
         params['StartRecordType'] = module.params.get('type')
 
+    if module.params.get('paginate'):
+        types = module.params.get('type_filter')
+
+        def match(record_set):
+            if types and record_set['Type'] not in types:
+                return False
+            return name_matches(module, record_set['Name'])
+
+        return paginate(client, module, 'list_resource_record_sets', 'ResourceRecordSets', params, match)
+
     results = client.list_resource_record_sets(**params)
     return results
 
@@ -394,6 +468,9 @@ def main():
             'count',
             'tags',
         ], default='list'),
+        paginate=dict(type='bool', default=False),
+        name_filter=dict(),
+        type_filter=dict(type='list'),
         )
     )
 
@@ -25,9 +25,17 @@ options:
   force:
     description:
       - When trying to delete a bucket, delete all keys in the bucket first (an s3 bucket must be empty for a successful deletion)
+      - Keys are removed with multi-object delete requests of up to 1000 keys. All object versions and delete markers of versioned buckets are removed too.
+        The number of deleted objects is returned as C(deleted_objects).
     required: false
     default: no
     choices: [ 'yes', 'no' ]
+  delete_workers:
+    description:
+      - Number of S3 connections used concurrently to delete keys when C(force=yes)
+    required: false
+    default: 4
+    version_added: "2.1"
   name:
     description:
       - Name of the s3 bucket
@@ -96,6 +104,8 @@ EXAMPLES = '''
     
 '''
 
+import Queue
+import threading
 import xml.etree.ElementTree as ET
 
 try:
@@ -107,6 +117,9 @@ try:
 except ImportError:
     HAS_BOTO = False
 
+# Maximum number of keys S3 accepts in one multi-object delete request
+DELETE_BATCH_SIZE = 1000
+
 def get_request_payment_status(bucket):
     
     response = bucket.get_request_payment()
@@ -257,7 +270,7 @@ def create_bucket(connection, module, location):
 
     module.exit_json(changed=changed, name=bucket.name, versioning=versioning_status, requester_pays=requester_pays_status, policy=current_policy, tags=current_tags_dict)
     
-def destroy_bucket(connection, module):
+def destroy_bucket(connection, module, connect):
     
     force = module.params.get("force")
     name = module.params.get("name")
@@ -272,22 +285,98 @@ def destroy_bucket(connection, module):
             # Bucket already absent
             module.exit_json(changed=changed)
     
+    deleted_objects = 0
     if force:
         try:
             # Empty the bucket
-            for key in bucket.list():
-                key.delete()
-                
+            connections = [connection]
+            for i in range(module.params.get("delete_workers") - 1):
+                connections.append(connect())
+            deleted_objects, errors = empty_bucket(bucket, connections)
         except BotoServerError, e:
             module.fail_json(msg=e.message)
-    
+        if errors:
+            module.fail_json(msg="Failed to delete %d objects from bucket %s" % (len(errors), name),
+                             deleted_objects=deleted_objects,
+                             errors=[dict(key=error.key, version_id=error.version_id, code=error.code, message=error.message) for error in errors[:100]])
+
     try:
         bucket = connection.delete_bucket(name)
         changed = True
     except S3ResponseError, e:
-        module.fail_json(msg=e.message)
-        
-    module.exit_json(changed=changed)
+        module.fail_json(msg=e.message, deleted_objects=deleted_objects)
+
+    module.exit_json(changed=changed, deleted_objects=deleted_objects)
+
+def list_bucket_batches(bucket):
+    """ Yield lists of (key name, version id) pairs, DELETE_BATCH_SIZE at a time.
+
+    Versioned buckets are listed with their versions and delete markers """
+    if bucket.get_versioning_status():
+        keys = bucket.list_versions()
+    else:
+        keys = bucket.list()
+
+    batch = []
+    for key in keys:
+        batch.append((key.name, getattr(key, 'version_id', None)))
+        if len(batch) == DELETE_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def empty_bucket(bucket, connections):
+    """ Delete every object in the bucket with multi-object delete requests.
+
+    Batches are listed in this thread and deleted by one worker thread per
+    connection. Returns the number of deleted objects and the list of
+    per-key errors reported by S3 """
+    batches = Queue.Queue(maxsize=len(connections) * 2)
+    results = dict(deleted=0, errors=[], exceptions=[])
+    lock = threading.Lock()
+
+    def worker(connection):
+        worker_bucket = connection.get_bucket(bucket.name, validate=False)
+        while True:
+            batch = batches.get()
+            if batch is None:
+                return
+            if results['exceptions']:
+                continue
+            try:
+                result = worker_bucket.delete_keys(batch, quiet=True)
+            except Exception, e:
+                lock.acquire()
+                results['exceptions'].append(e)
+                lock.release()
+                continue
+            lock.acquire()
+            results['deleted'] += len(batch) - len(result.errors)
+            results['errors'].extend(result.errors)
+            lock.release()
+
+    threads = []
+    for connection in connections:
+        thread = threading.Thread(target=worker, args=(connection,))
+        thread.setDaemon(True)
+        thread.start()
+        threads.append(thread)
+
+    try:
+        for batch in list_bucket_batches(bucket):
+            if results['exceptions']:
+                break
+            batches.put(batch)
+    finally:
+        for thread in threads:
+            batches.put(None)
+        for thread in threads:
+            thread.join()
+
+    if results['exceptions']:
+        raise results['exceptions'][0]
+    return results['deleted'], results['errors']
 
 def is_fakes3(s3_url):
     """ Return True if s3_url has scheme fakes3:// """
@@ -306,12 +395,46 @@ def is_walrus(s3_url):
     else:
         return False
 
+def get_s3_connection(module, s3_url, location, aws_connect_params):
+
+    # Look at s3_url and tweak connection settings
+    # if connecting to Walrus or fakes3
+    try:
+        if is_fakes3(s3_url):
+            fakes3 = urlparse.urlparse(s3_url)
+            connection = S3Connection(
+                is_secure=fakes3.scheme == 'fakes3s',
+                host=fakes3.hostname,
+                port=fakes3.port,
+                calling_format=OrdinaryCallingFormat(),
+                **aws_connect_params
+            )
+        elif is_walrus(s3_url):
+            walrus = urlparse.urlparse(s3_url).hostname
+            connection = boto.connect_walrus(walrus, **aws_connect_params)
+        else:
+            connection = boto.s3.connect_to_region(location, is_secure=True, calling_format=OrdinaryCallingFormat(), **aws_connect_params)
+            # use this as fallback because connect_to_region seems to fail in boto + non 'classic' aws accounts in some cases
+            if connection is None:
+                connection = boto.connect_s3(**aws_connect_params)
+
+    except boto.exception.NoAuthHandlerFound, e:
+        module.fail_json(msg='No Authentication Handler found: %s ' % str(e))
+    except Exception, e:
+        module.fail_json(msg='Failed to connect to S3: %s' % str(e))
+
+    if connection is None: # this should never happen
+        module.fail_json(msg ='Unknown error, failed to create s3 connection, no information from boto.')
+
+    return connection
+
 def main():
     
     argument_spec = ec2_argument_spec()
     argument_spec.update(
         dict(
             force = dict(required=False, default='no', type='bool'),
+            delete_workers = dict(required=False, default=4, type='int'),
             policy = dict(required=False, default=None),
             name = dict(required=True),
             requester_pays = dict(default='no', type='bool'),
@@ -326,6 +449,9 @@ def main():
 
     if not HAS_BOTO:
         module.fail_json(msg='boto required for this module')
+
+    if module.params.get('delete_workers') < 1:
+        module.fail_json(msg='delete_workers must be 1 or greater')
     
     region, ec2_url, aws_connect_params = get_aws_connection_info(module)
 
@@ -343,41 +469,15 @@ def main():
     if not s3_url and 'S3_URL' in os.environ:
         s3_url = os.environ['S3_URL']
 
-    # Look at s3_url and tweak connection settings
-    # if connecting to Walrus or fakes3
-    try:
-        if is_fakes3(s3_url):
-            fakes3 = urlparse.urlparse(s3_url)
-            connection = S3Connection(
-                is_secure=fakes3.scheme == 'fakes3s',
-                host=fakes3.hostname,
-                port=fakes3.port,
-                calling_format=OrdinaryCallingFormat(),
-                **aws_connect_params
-            )
-        elif is_walrus(s3_url):
-            walrus = urlparse.urlparse(s3_url).hostname
-            connection = boto.connect_walrus(walrus, **aws_connect_params)
-        else:
-            connection = boto.s3.connect_to_region(location, is_secure=True, calling_format=OrdinaryCallingFormat(), **aws_connect_params)
-            # use this as fallback because connect_to_region seems to fail in boto + non 'classic' aws accounts in some cases
-            if connection is None:
-                connection = boto.connect_s3(**aws_connect_params)
-
-    except boto.exception.NoAuthHandlerFound, e:
-        module.fail_json(msg='No Authentication Handler found: %s ' % str(e))
-    except Exception, e:
-        module.fail_json(msg='Failed to connect to S3: %s' % str(e))
-
-    if connection is None: # this should never happen
-        module.fail_json(msg ='Unknown error, failed to create s3 connection, no information from boto.')
+    connect = lambda: get_s3_connection(module, s3_url, location, aws_connect_params)
+    connection = connect()
 
     state = module.params.get("state")
 
     if state == 'present':
         create_bucket(connection, module, location)
     elif state == 'absent':
-        destroy_bucket(connection, module)
+        destroy_bucket(connection, module, connect)
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.ec2 import *
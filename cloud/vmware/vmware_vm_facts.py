@@ -24,6 +24,7 @@ module: vmware_vm_facts
 short_description: Return basic facts pertaining to a vSphere virtual machine guest
 description:
     - Return basic facts pertaining to a vSphere virtual machine guest
+    - Properties of all guests are fetched with paged property collector requests
 version_added: 2.0
 author: "Joseph Callen (@jcpowermac)"
 notes:
@@ -46,6 +47,21 @@ options:
             - The password of the vSphere vCenter
         required: True
         aliases: ['pass', 'pwd']
+    properties:
+        description:
+            - Additional virtual machine property paths to return for each guest,
+              for example C(config.hardware.numCPU) or C(runtime.host).
+              Values that are not plain types are returned as strings.
+        required: False
+        default: []
+        version_added: 2.1
+    page_size:
+        description:
+            - Maximum number of virtual machines returned per property collector
+              page. Defaults to the server's page size.
+        required: False
+        default: null
+        version_added: 2.1
 '''
 
 EXAMPLES = '''
@@ -55,6 +71,17 @@ EXAMPLES = '''
     hostname: esxi_or_vcenter_ip_or_hostname
     username: username
     password: password
+
+- name: Gather all virtual machines with CPU and memory sizing, 500 per page
+  local_action:
+    module: vmware_vm_facts
+    hostname: esxi_or_vcenter_ip_or_hostname
+    username: username
+    password: password
+    properties:
+      - config.hardware.numCPU
+      - config.hardware.memoryMB
+    page_size: 500
 '''
 
 try:
@@ -64,34 +91,84 @@ except ImportError:
     HAS_PYVMOMI = False
 
 
-# https://github.com/vmware/pyvmomi-community-samples/blob/master/samples/getallvms.py
-def get_all_virtual_machines(content):
-    virtual_machines = get_all_objs(content, [vim.VirtualMachine])
+SUMMARY_PROPERTIES = [
+    'summary.config.name',
+    'summary.config.guestFullName',
+    'summary.runtime.powerState',
+    'summary.guest.ipAddress',
+]
+
+
+def to_fact(value):
+    if value is None or isinstance(value, (bool, int, long, float, basestring)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [to_fact(item) for item in value]
+    return str(value)
+
+
+def retrieve_vm_properties(content, properties, page_size=None):
+    """Retrieve properties of all VMs with paged PropertyCollector calls.
+
+    One RetrievePropertiesEx request is made per page of page_size VMs,
+    instead of dereferencing each managed object separately.
+    """
+    container = content.viewManager.CreateContainerView(content.rootFolder, [vim.VirtualMachine], True)
+    try:
+        traversal_spec = vmodl.query.PropertyCollector.TraversalSpec(
+            name='traverseEntities', path='view', skip=False, type=vim.view.ContainerView)
+        obj_spec = vmodl.query.PropertyCollector.ObjectSpec(
+            obj=container, skip=True, selectSet=[traversal_spec])
+        prop_spec = vmodl.query.PropertyCollector.PropertySpec(
+            type=vim.VirtualMachine, all=False, pathSet=properties)
+        filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+            objectSet=[obj_spec], propSet=[prop_spec])
+        options = vmodl.query.PropertyCollector.RetrieveOptions(maxObjects=page_size)
+
+        collector = content.propertyCollector
+        result = collector.RetrievePropertiesEx([filter_spec], options)
+        while result is not None:
+            for obj in result.objects:
+                yield dict([(prop.name, prop.val) for prop in obj.propSet])
+            if not result.token:
+                break
+            result = collector.ContinueRetrievePropertiesEx(result.token)
+    finally:
+        container.Destroy()
+
+
+def get_all_virtual_machines(content, extra_properties=None, page_size=None):
+    if extra_properties is None:
+        extra_properties = []
+    properties = SUMMARY_PROPERTIES + [p for p in extra_properties if p not in SUMMARY_PROPERTIES]
     _virtual_machines = {}
 
-    for vm in virtual_machines:
-        _ip_address = ""
-        summary = vm.summary
-        if summary.guest is not None:
-            _ip_address = summary.guest.ipAddress
-            if _ip_address is None:
-                _ip_address = ""
-
-        virtual_machine = {
-            summary.config.name: {
-                "guest_fullname": summary.config.guestFullName,
-                "power_state": summary.runtime.powerState,
-                "ip_address": _ip_address
-            }
+    for props in retrieve_vm_properties(content, properties, page_size):
+        _ip_address = props.get('summary.guest.ipAddress')
+        if _ip_address is None:
+            _ip_address = ""
+
+        facts = {
+            "guest_fullname": props.get('summary.config.guestFullName'),
+            "power_state": props.get('summary.runtime.powerState'),
+            "ip_address": _ip_address
         }
+        for prop in extra_properties:
+            facts[prop] = to_fact(props.get(prop))
 
-        _virtual_machines.update(virtual_machine)
+        _virtual_machines[props.get('summary.config.name')] = facts
     return _virtual_machines
 
 
 def main():
 
     argument_spec = vmware_argument_spec()
+    argument_spec.update(
+        dict(
+            properties=dict(required=False, type='list', default=[]),
+            page_size=dict(required=False, type='int', default=None),
+        )
+    )
     module = AnsibleModule(argument_spec=argument_spec, supports_check_mode=False)
 
     if not HAS_PYVMOMI:
@@ -99,7 +176,8 @@ def main():
 
     try:
         content = connect_to_api(module)
-        _virtual_machines = get_all_virtual_machines(content)
+        _virtual_machines = get_all_virtual_machines(content, module.params['properties'],
+                                                     module.params['page_size'])
         module.exit_json(changed=False, virtual_machines=_virtual_machines)
     except vmodl.RuntimeFault as runtime_fault:
         module.fail_json(msg=runtime_fault.msg)
@@ -42,6 +42,8 @@ options:
   src:
     description:
       - The file to push to vCenter
+      - If I(src) is a directory, every regular file directly inside it is uploaded below I(path),
+        over I(concurrency) parallel connections, and per-file outcomes are returned in C(results).
     required: true
   datacenter:
     description:
@@ -55,6 +57,35 @@ options:
     description:
       - The file to push to the datastore on the vCenter server.
     required: true
+  skip_identical:
+    description:
+      - Skip the upload when the datastore already holds an identical file.
+      - C(size) compares the size and modification time returned by a HEAD request; the
+        remote file must be at least as recent as the local one.
+      - C(checksum) compares the SHA1 checksum of the local file with a C(<path>.sha1)
+        sidecar file, which is written after every successful upload in this mode.
+    required: false
+    default: 'no'
+    choices: ['no', 'size', 'checksum']
+    version_added: 2.1
+  retries:
+    description:
+      - Number of times an upload is restarted when vSphere resets the connection.
+    required: false
+    default: 3
+    version_added: 2.1
+  retry_delay:
+    description:
+      - Seconds to wait before restarting a reset upload.
+    required: false
+    default: 5
+    version_added: 2.1
+  concurrency:
+    description:
+      - Number of parallel uploads when I(src) is a directory.
+    required: false
+    default: 4
+    version_added: 2.1
   validate_certs:
     description:
       - If C(no), SSL certificates will not be validated. This should only be
@@ -64,6 +95,7 @@ options:
     choices: ['yes', 'no']
 
 notes:
+  - Files are streamed from disk in 1 MB blocks, so memory use does not grow with the file size.
   - "This module ought to be run from a system that can access vCenter directly and has the file to transfer.
     It can be the normal remote target or you can change it either by using C(transport: local) or using C(delegate_to)."
   - Tested on vSphere 5.5
@@ -74,13 +106,21 @@ EXAMPLES = '''
   transport: local
 - vsphere_copy: host=vhost login=vuser password=vpass src=/other/local/file datacenter='DC2 Someplace' datastore=datastore2 path=other/remote/file
   delegate_to: other_system
+- vsphere_copy: host=vhost login=vuser password=vpass src=/srv/templates datacenter='DC1 Someplace' datastore=datastore1 path=templates skip_identical=checksum concurrency=8
+  transport: local
 '''
 
-import atexit
 import urllib
-import mmap
 import errno
+import os
 import socket
+import threading
+import time
+import Queue
+from email.utils import parsedate_tz, mktime_tz
+
+# Size of the blocks handed to httplib while streaming a file
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 def vmware_path(datastore, datacenter, path):
     ''' Constructs a URL path that VSphere accepts reliably '''
@@ -96,6 +136,162 @@ def vmware_path(datastore, datacenter, path):
     params = urllib.urlencode(params)
     return "%s?%s" % (path, params)
 
+class FileStream(object):
+    ''' File-like object that streams a file in UPLOAD_CHUNK_SIZE blocks
+
+    httplib asks for small blocks; larger ones are returned to cut the number
+    of reads and sends, while only one block is held in memory at a time '''
+
+    def __init__(self, fd, size):
+        self.fd = fd
+        self.size = size
+
+    def read(self, size=-1):
+        return self.fd.read(UPLOAD_CHUNK_SIZE)
+
+    def __len__(self):
+        return self.size
+
+def connection_reset(e):
+    ''' Returns True if the exception (or the one it wraps) is ECONNRESET '''
+    e = getattr(e, 'reason', e)
+    return isinstance(e, socket.error) and len(e.args) > 0 and e.args[0] == errno.ECONNRESET
+
+class Uploader(object):
+
+    def __init__(self, module):
+        self.module = module
+        self.host = module.params.get('host')
+        self.datacenter = module.params.get('datacenter')
+        self.datastore = module.params.get('datastore')
+        self.skip_identical = module.params.get('skip_identical')
+        self.retries = module.params.get('retries')
+        self.retry_delay = module.params.get('retry_delay')
+        self.auth = dict(url_username=module.params.get('login'),
+                         url_password=module.params.get('password'),
+                         validate_certs=module.params.get('validate_certs'),
+                         force_basic_auth=True)
+
+    def url(self, dest):
+        return 'https://%s%s' % (self.host, vmware_path(self.datastore, self.datacenter, dest))
+
+    def is_identical(self, src, dest):
+        ''' Checks whether the datastore already holds the same file '''
+        if self.skip_identical == 'size':
+            try:
+                r = open_url(self.url(dest), method='HEAD', **self.auth)
+            except Exception:
+                return False
+            length = r.headers.get('content-length', None)
+            last_modified = r.headers.get('last-modified', None)
+            if length is None or last_modified is None:
+                return False
+            if int(length) != os.path.getsize(src):
+                return False
+            return mktime_tz(parsedate_tz(last_modified)) >= os.path.getmtime(src)
+        elif self.skip_identical == 'checksum':
+            try:
+                r = open_url(self.url(dest + '.sha1'), **self.auth)
+                remote_checksum = r.read().strip()
+            except Exception:
+                return False
+            return remote_checksum == self.module.sha1(src)
+        return False
+
+    def put(self, url, data, size):
+        headers = {
+            "Content-Type": "application/octet-stream",
+            "Content-Length": str(size),
+        }
+        return open_url(url, data=data, headers=headers, method='PUT', **self.auth)
+
+    def upload(self, src, dest):
+        ''' Uploads one file and returns a result dict, retrying on ECONNRESET '''
+        url = self.url(dest)
+        result = dict(src=src, dest=dest, url=url, changed=False, failed=False)
+
+        if self.skip_identical != 'no' and self.is_identical(src, dest):
+            result['msg'] = 'Identical file already present on the datastore'
+            return result
+
+        size = os.path.getsize(src)
+        attempt = 0
+        while True:
+            fd = open(src, "rb")
+            try:
+                try:
+                    r = self.put(url, FileStream(fd, size), size)
+                    break
+                except Exception, e:
+                    if connection_reset(e) and attempt < self.retries:
+                        attempt += 1
+                        time.sleep(self.retry_delay)
+                        continue
+                    error_code = -1
+                    if connection_reset(e):
+                        # VSphere resets connection if the file is in use and cannot be replaced
+                        msg = 'Failed to upload, image probably in use'
+                        error_code = errno.ECONNRESET
+                    else:
+                        msg = str(e)
+                        try:
+                            if isinstance(e[0], int):
+                                error_code = e[0]
+                        except (IndexError, KeyError, TypeError):
+                            pass
+                    result.update(failed=True, msg=msg, status=None, errno=error_code, reason=str(e), attempts=attempt + 1)
+                    return result
+            finally:
+                fd.close()
+
+        status = r.getcode()
+        result.update(status=status, reason=r.msg, attempts=attempt + 1)
+        if 200 <= status < 300:
+            result['changed'] = True
+            if self.skip_identical == 'checksum':
+                checksum = self.module.sha1(src)
+                try:
+                    self.put(self.url(dest + '.sha1'), checksum, len(checksum))
+                except Exception, e:
+                    result.update(failed=True, msg='Failed to upload checksum file: %s' % str(e))
+        else:
+            length = r.headers.get('content-length', None)
+            if r.headers.get('transfer-encoding', '').lower() == 'chunked':
+                chunked = 1
+            else:
+                chunked = 0
+            result.update(failed=True, msg='Failed to upload', errno=None, length=length, headers=dict(r.headers), chunked=chunked)
+        return result
+
+    def upload_many(self, files, concurrency):
+        ''' Uploads (src, dest) pairs over concurrency parallel connections '''
+        pending = Queue.Queue()
+        for item in files:
+            pending.put(item)
+        results = {}
+
+        def worker():
+            while True:
+                try:
+                    src, dest = pending.get_nowait()
+                except Queue.Empty:
+                    return
+                try:
+                    results[src] = self.upload(src, dest)
+                except Exception, e:
+                    results[src] = dict(src=src, dest=dest, changed=False, failed=True, msg=str(e))
+
+        threads = []
+        for i in range(min(concurrency, len(files))):
+            thread = threading.Thread(target=worker)
+            thread.setDaemon(True)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+        return [results[src] for src, dest in files]
+
 def main():
 
     module = AnsibleModule(
@@ -108,64 +304,44 @@ def main():
             datastore = dict(required=True),
             dest = dict(required=True, aliases=[ 'path' ]),
             validate_certs = dict(required=False, default=True, type='bool'),
+            skip_identical = dict(required=False, default='no', choices=['no', 'size', 'checksum']),
+            retries = dict(required=False, default=3, type='int'),
+            retry_delay = dict(required=False, default=5, type='int'),
+            concurrency = dict(required=False, default=4, type='int'),
         ),
         # Implementing check-mode using HEAD is impossible, since size/date is not 100% reliable
         supports_check_mode = False,
     )
 
-    host = module.params.get('host')
-    login = module.params.get('login')
-    password = module.params.get('password')
     src = module.params.get('src')
-    datacenter = module.params.get('datacenter')
-    datastore = module.params.get('datastore')
     dest = module.params.get('dest')
-    validate_certs = module.params.get('validate_certs')
-
-    fd = open(src, "rb")
-    atexit.register(fd.close)
-
-    data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
-    atexit.register(data.close)
-
-    remote_path = vmware_path(datastore, datacenter, dest)
-    url = 'https://%s%s' % (host, remote_path)
-
-    headers = {
-        "Content-Type": "application/octet-stream",
-        "Content-Length": str(len(data)),
-    }
-
-    try:
-        r = open_url(url, data=data, headers=headers, method='PUT',
-                url_username=login, url_password=password, validate_certs=validate_certs,
-                force_basic_auth=True)
-    except socket.error, e:
-        if isinstance(e.args, tuple) and e[0] == errno.ECONNRESET:
-            # VSphere resets connection if the file is in use and cannot be replaced
-            module.fail_json(msg='Failed to upload, image probably in use', status=None, errno=e[0], reason=str(e), url=url)
-        else:
-            module.fail_json(msg=str(e), status=None, errno=e[0], reason=str(e), url=url)
-    except Exception, e:
-        error_code = -1
-        try:
-            if isinstance(e[0], int):
-                error_code = e[0]
-        except KeyError:
-            pass
-        module.fail_json(msg=str(e), status=None, errno=error_code, reason=str(e), url=url)
-
-    status = r.getcode()
-    if 200 <= status < 300:
-        module.exit_json(changed=True, status=status, reason=r.msg, url=url)
-    else:
-        length = r.headers.get('content-length', None)
-        if r.headers.get('transfer-encoding', '').lower() == 'chunked':
-            chunked = 1
-        else:
-            chunked = 0
+    concurrency = module.params.get('concurrency')
+
+    if concurrency < 1:
+        module.fail_json(msg='concurrency must be 1 or greater')
+
+    uploader = Uploader(module)
+
+    if os.path.isdir(src):
+        files = []
+        for name in sorted(os.listdir(src)):
+            path = os.path.join(src, name)
+            if os.path.isfile(path):
+                files.append((path, '%s/%s' % (dest.rstrip('/'), name)))
+
+        results = uploader.upload_many(files, concurrency)
+        changed = len([r for r in results if r['changed']]) > 0
+        failed = [r for r in results if r['failed']]
+        if failed:
+            module.fail_json(msg='Failed to upload %d of %d files' % (len(failed), len(results)), changed=changed, results=results)
+        module.exit_json(changed=changed, results=results)
 
-        module.fail_json(msg='Failed to upload', errno=None, status=status, reason=r.msg, length=length, headers=dict(r.headers), chunked=chunked, url=url)
+    result = uploader.upload(src, dest)
+    del result['src']
+    del result['dest']
+    if result.pop('failed'):
+        module.fail_json(**result)
+    module.exit_json(**result)
 
 # Import module snippets
 from ansible.module_utils.basic import *
@@ -99,6 +99,51 @@ options:
           - the port on which the consul agent is running
         required: false
         default: 8500
+    values:
+        description:
+          - a dict of keys and values to store under the prefix given by key.
+            Nested dicts are stored as nested keys joined with '/'. All the
+            keys under the prefix are read with a single recursive query and
+            only the differences are written, using the transaction endpoint
+            in batches of 64 operations. Each batch is applied atomically.
+            With state=absent the keys given in values are deleted instead,
+            whatever their current value. Cannot be used with value.
+        required: false
+        default: None
+        version_added: "2.1"
+    purge:
+        description:
+          - used with values, removes the keys under the prefix that are not
+            in values.
+        required: false
+        default: false
+        version_added: "2.1"
+    snapshot_cas:
+        description:
+          - used with values, makes every write and delete conditional on the
+            ModifyIndex read in the initial query, so a batch fails and is
+            rolled back if another client changed one of its keys meanwhile.
+        required: false
+        default: false
+        version_added: "2.1"
+    wait_for:
+        description:
+          - instead of changing the key, wait until it is 'present', 'absent',
+            has the given value ('value') or is not locked by any session
+            ('released'). The key is watched with Consul blocking queries, so
+            the module sleeps on the agent until the key changes rather than
+            polling it.
+        required: false
+        choices: ['present', 'absent', 'value', 'released']
+        default: None
+        version_added: "2.1"
+    wait_timeout:
+        description:
+          - number of seconds to wait for the condition given by wait_for
+            before failing.
+        required: false
+        default: 300
+        version_added: "2.1"
 """
 
 
@@ -118,9 +163,28 @@ EXAMPLES = '''
     consul_kv:
       key: ansible/groups/dc1/somenode
       value: 'top_secret'
+
+  - name: sync the configuration of an environment, removing stale keys
+    consul_kv:
+      key: config/production
+      values:
+        database:
+          host: db1.example.com
+          port: 5432
+        cache_ttl: 300
+      purge: yes
+      snapshot_cas: yes
+
+  - name: wait until the leader releases the deploy lock
+    consul_kv:
+      key: locks/deploy
+      wait_for: released
+      wait_timeout: 900
 '''
 
+import base64
 import sys
+import time
 
 try:
     import json
@@ -129,6 +193,7 @@ except ImportError:
 
 try:
     import consul
+    import requests
     from requests.exceptions import ConnectionError
     python_consul_installed = True
 except ImportError, e:
@@ -136,10 +201,23 @@ except ImportError, e:
 
 from requests.exceptions import ConnectionError
 
+# Maximum number of operations Consul accepts in a single transaction
+TXN_BATCH_SIZE = 64
+
+# Longest wait Consul allows for a single blocking query
+MAX_BLOCKING_WAIT = 600
+
 def execute(module):
 
     state = module.params.get('state')
 
+    if module.params.get('wait_for'):
+        wait_for_key(module)
+        return
+    if module.params.get('values') is not None:
+        sync_values(module)
+        return
+
     if state == 'acquire' or state == 'release':
         lock(module, state)
     if state == 'present':
@@ -220,6 +298,162 @@ def remove_value(module):
                      data=existing)
 
 
+def wait_for_key(module):
+    ''' block until the key reaches the state given by wait_for. each query
+    passes the index of the previous answer, so the agent only replies once
+    the key has changed or the wait time has elapsed. '''
+    consul_api = get_consul_api(module)
+
+    key = module.params.get('key')
+    condition = module.params.get('wait_for')
+    value = module.params.get('value')
+    timeout = module.params.get('wait_timeout')
+
+    if condition == 'value' and value is None:
+        module.fail_json(msg='value is required when wait_for is value')
+
+    deadline = time.time() + timeout
+    index = None
+    while True:
+        remaining = int(deadline - time.time())
+        wait = '%ds' % max(1, min(remaining, MAX_BLOCKING_WAIT))
+        new_index, data = consul_api.kv.get(key, index=index, wait=wait)
+
+        if key_matches(condition, data, value):
+            module.exit_json(changed=False,
+                             index=new_index,
+                             key=key,
+                             data=data)
+
+        if time.time() >= deadline:
+            module.fail_json(msg='Timed out after %ds waiting for %s to be %s'
+                             % (timeout, key, condition),
+                             index=new_index,
+                             key=key,
+                             data=data)
+
+        # an index that goes backwards means the store was reset, start over
+        if index is not None and int(new_index) < int(index):
+            index = None
+        else:
+            index = new_index
+
+
+def key_matches(condition, data, value):
+    if condition == 'present':
+        return data is not None
+    elif condition == 'absent':
+        return data is None
+    elif condition == 'value':
+        return data is not None and data['Value'] == value
+    return data is None or not data.get('Session')
+
+
+def sync_values(module):
+    ''' make the keys under the prefix match the values dict, applying the
+    differences with as few transactions as possible. '''
+    consul_api = get_consul_api(module)
+
+    prefix = module.params.get('key').rstrip('/') + '/'
+    desired = flatten_values(prefix, module.params.get('values'))
+    flags = module.params.get('flags')
+    snapshot_cas = module.params.get('snapshot_cas')
+
+    index, existing = consul_api.kv.get(prefix, recurse=True)
+    current = dict((entry['Key'], entry) for entry in existing or [])
+
+    operations = []
+    created = []
+    updated = []
+    deleted = []
+
+    if module.params.get('state') == 'absent':
+        # only the keys named in values are removed, purge does not apply
+        for key in sorted(desired):
+            if key in current:
+                deleted.append(key)
+                operation = {'Verb': 'delete', 'Key': key}
+                if snapshot_cas:
+                    operation['Verb'] = 'delete-cas'
+                    operation['Index'] = current[key]['ModifyIndex']
+                operations.append(operation)
+        desired = {}
+
+    for key in sorted(desired):
+        value = desired[key]
+        entry = current.get(key)
+        if entry is None:
+            created.append(key)
+        elif entry['Value'] != value or (flags is not None and entry['Flags'] != int(flags)):
+            updated.append(key)
+        else:
+            continue
+
+        operation = {'Verb': 'set', 'Key': key, 'Value': base64.b64encode(value)}
+        if flags is not None:
+            operation['Flags'] = int(flags)
+        if snapshot_cas:
+            operation['Verb'] = 'cas'
+            operation['Index'] = entry and entry['ModifyIndex'] or 0
+        operations.append(operation)
+
+    if module.params.get('purge') and module.params.get('state') != 'absent':
+        for key in sorted(current):
+            if key not in desired:
+                deleted.append(key)
+                operation = {'Verb': 'delete', 'Key': key}
+                if snapshot_cas:
+                    operation['Verb'] = 'delete-cas'
+                    operation['Index'] = current[key]['ModifyIndex']
+                operations.append(operation)
+
+    for start in range(0, len(operations), TXN_BATCH_SIZE):
+        apply_transaction(module, operations[start:start + TXN_BATCH_SIZE])
+
+    module.exit_json(changed=bool(operations),
+                     index=index,
+                     key=module.params.get('key'),
+                     created=created,
+                     updated=updated,
+                     deleted=deleted)
+
+
+def flatten_values(prefix, values):
+    ''' turn a tree of dicts into a flat dict of full keys to string values '''
+    flattened = {}
+    for name, value in values.items():
+        key = prefix + str(name).strip('/')
+        if isinstance(value, dict):
+            flattened.update(flatten_values(key + '/', value))
+        elif isinstance(value, (list, tuple)):
+            flattened[key] = json.dumps(value)
+        elif value is None:
+            flattened[key] = ''
+        else:
+            flattened[key] = str(value)
+    return flattened
+
+
+def apply_transaction(module, operations):
+    ''' send one batch of KV operations to the /v1/txn endpoint '''
+    url = 'http://%s:%s/v1/txn' % (module.params.get('host'),
+                                   module.params.get('port'))
+    params = {}
+    if module.params.get('token'):
+        params['token'] = module.params.get('token')
+
+    response = requests.put(url, params=params,
+                            data=json.dumps([{'KV': op} for op in operations]))
+    if response.status_code == 409:
+        errors = response.json().get('Errors') or []
+        details = ', '.join('%s: %s' % (operations[error['OpIndex']]['Key'],
+                                        error['What']) for error in errors)
+        raise Exception('Transaction rolled back: %s' % details)
+    if response.status_code != 200:
+        raise Exception('Transaction failed with status %s: %s' % (
+                        response.status_code, response.text))
+
+
 def get_consul_api(module, token=None):
     return consul.Consul(host=module.params.get('host'),
                          port=module.params.get('port'),
@@ -238,14 +472,21 @@ def main():
         key=dict(required=True),
         host=dict(default='localhost'),
         port=dict(default=8500, type='int'),
+        purge=dict(required=False, type='bool', default=False),
         recurse=dict(required=False, type='bool'),
         retrieve=dict(required=False, default=True),
         state=dict(default='present', choices=['present', 'absent']),
+        snapshot_cas=dict(required=False, type='bool', default=False),
         token=dict(required=False, default='anonymous', no_log=True),
-        value=dict(required=False)
+        value=dict(required=False),
+        values=dict(required=False, type='dict'),
+        wait_for=dict(required=False, choices=['present', 'absent', 'value', 'released']),
+        wait_timeout=dict(required=False, type='int', default=300)
     )
 
-    module = AnsibleModule(argument_spec, supports_check_mode=False)
+    module = AnsibleModule(argument_spec,
+                           mutually_exclusive=[['value', 'values']],
+                           supports_check_mode=False)
 
     test_dependencies(module)
         
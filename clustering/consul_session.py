@@ -88,6 +88,22 @@ options:
           - the port on which the consul agent is running
         required: false
         default: 8500
+    wait:
+        description:
+          - with state=node, wait until the node has no sessions left before
+            returning. The sessions are watched with Consul blocking queries,
+            so the module sleeps on the agent until they change rather than
+            polling it.
+        required: false
+        default: false
+        version_added: "2.1"
+    wait_timeout:
+        description:
+          - number of seconds to wait for the sessions of the node to drain
+            before failing.
+        required: false
+        default: 300
+        version_added: "2.1"
 """
 
 EXAMPLES = '''
@@ -111,17 +127,25 @@ EXAMPLES = '''
 
 - name: retrieve active sessions
   consul_session: state=list
+
+- name: wait until all the sessions of a node are gone
+  consul_session: state=node node=web1 wait=yes wait_timeout=600
 '''
 
 import sys
+import time
 
 try:
     import consul
+    import requests
     from requests.exceptions import ConnectionError
     python_consul_installed = True
 except ImportError, e:
     python_consul_installed = False
 
+# Longest wait Consul allows for a single blocking query
+MAX_BLOCKING_WAIT = 600
+
 def execute(module):
 
     state = module.params.get('state')
@@ -152,7 +176,10 @@ def lookup_sessions(module):
             if not node:
                 module.fail_json(
                   msg="node name is required to retrieve sessions for node")
-            sessions = consul.session.node(node, dc=datacenter)
+            if module.params.get('wait'):
+                sessions = wait_for_node_drained(module, node, datacenter)
+            else:
+                sessions = consul.session.node(node, dc=datacenter)
             module.exit_json(changed=True,
                              node=node,
                              sessions=sessions)
@@ -171,6 +198,48 @@ def lookup_sessions(module):
         module.fail_json(msg="Could not retrieve session info %s" % e)
 
 
+def wait_for_node_drained(module, node, datacenter):
+    ''' block until the node holds no sessions. each query passes the index
+    of the previous answer, so the agent only replies once the sessions of
+    the node have changed or the wait time has elapsed. python-consul does
+    not expose the wait parameter for this endpoint, so the http api is
+    queried directly. '''
+    url = 'http://%s:%s/v1/session/node/%s' % (module.params.get('host'),
+                                               module.params.get('port'),
+                                               node)
+    timeout = module.params.get('wait_timeout')
+    deadline = time.time() + timeout
+    index = None
+    while True:
+        remaining = int(deadline - time.time())
+        params = {'wait': '%ds' % max(1, min(remaining, MAX_BLOCKING_WAIT))}
+        if index is not None:
+            params['index'] = index
+        if datacenter:
+            params['dc'] = datacenter
+
+        response = requests.get(url, params=params)
+        if response.status_code != 200:
+            raise Exception('Could not retrieve sessions for %s: %s' % (
+                            node, response.text))
+        sessions = response.json() or []
+        if not sessions:
+            return sessions
+
+        if time.time() >= deadline:
+            module.fail_json(msg='Timed out after %ds waiting for the sessions '
+                             'of %s to drain' % (timeout, node),
+                             node=node,
+                             sessions=sessions)
+
+        new_index = int(response.headers.get('X-Consul-Index', 0))
+        # an index that goes backwards means the store was reset, start over
+        if index is not None and new_index < index:
+            index = None
+        else:
+            index = new_index
+
+
 def update_session(module):
 
     name = module.params.get('name')
@@ -248,7 +317,9 @@ def main():
         name=dict(required=False),
         node=dict(required=False),
         state=dict(default='present',
-                   choices=['present', 'absent', 'info', 'node', 'list'])
+                   choices=['present', 'absent', 'info', 'node', 'list']),
+        wait=dict(required=False, type='bool', default=False),
+        wait_timeout=dict(required=False, type='int', default=300)
     )
 
     module = AnsibleModule(argument_spec, supports_check_mode=False)
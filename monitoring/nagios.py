@@ -37,7 +37,8 @@ options:
                "servicegroup_host_downtime" ]
   host:
     description:
-      - Host to operate on in Nagios.
+      - Host to operate on in Nagios. Separate multiple hosts with commas;
+        all of their commands are written to the command file at once.
     required: false
     default: null
   cmdfile:
@@ -82,6 +83,18 @@ options:
         should not include the submitted time header or the line-feed
         B(Required) option when using the C(command) action.
     required: true
+  livestatus:
+    version_added: "2.1"
+    description:
+      - Path to a local MK Livestatus UNIX socket. When given, the current
+        notification and downtime state of the affected hosts and services
+        is read with one query per table before acting, and only commands
+        that change that state are written. The task reports C(changed) only
+        if a command was written. Downtime counts as in effect when the host
+        or service is already in any scheduled downtime. Servicegroup and
+        raw C(command) actions are always written.
+    required: false
+    default: null
 
 author: "Tim Bielawa (@tbielawa)"
 '''
@@ -103,6 +116,10 @@ EXAMPLES = '''
 # schedule downtime for a few services
 - nagios: action=downtime services=frob,foobar,qeuz host={{ inventory_hostname }}
 
+# schedule downtime for ALL services on every host in the play, in one task
+- nagios: action=downtime minutes=60 service=all host={{ play_hosts | join(',') }}
+  run_once: true
+
 # set 30 minutes downtime for all services in servicegroup foo
 - nagios: action=servicegroup_service_downtime minutes=30 servicegroup=foo host={{ inventory_hostname }}
 
@@ -124,6 +141,10 @@ EXAMPLES = '''
 # unsilence all alerts
 - nagios: action=unsilence host={{ inventory_hostname }}
 
+# disable alerts only where they are still enabled, according to livestatus
+- nagios: action=disable_alerts service=httpd,nfs host={{ inventory_hostname }}
+          livestatus=/var/lib/nagios/rw/live
+
 # SHUT UP NAGIOS
 - nagios: action=silence_nagios
 
@@ -137,7 +158,17 @@ EXAMPLES = '''
 import ConfigParser
 import types
 import time
+try:
+    import json
+except ImportError:
+    import simplejson as json
+import os
 import os.path
+import socket
+
+# Minimum atomic FIFO write size guaranteed by POSIX, used when the
+# command file does not report its own.
+PIPE_BUF = 512
 
 ######################################################################
 
@@ -178,6 +209,161 @@ def which_cmdfile():
 ######################################################################
 
 
+class LivestatusError(Exception):
+    pass
+
+
+class Livestatus(object):
+    """
+    Minimal client for a local MK Livestatus UNIX socket.
+
+    All queries of a run share one connection (KeepAlive), and each
+    answer is read exactly using the fixed16 response header.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.client = None
+
+    def query(self, table, columns, filters=None):
+        """
+        Run one GET query and return the rows as dicts keyed by column.
+        Several filters are combined with Or.
+        """
+
+        lines = ['GET %s' % table, 'Columns: %s' % ' '.join(columns)]
+        if filters:
+            for f in filters:
+                lines.append('Filter: %s' % f)
+            if len(filters) > 1:
+                lines.append('Or: %d' % len(filters))
+        lines.extend(['OutputFormat: json', 'KeepAlive: on',
+                      'ResponseHeader: fixed16'])
+
+        if self.client is None:
+            self.client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.client.connect(self.path)
+        self.client.sendall('\n'.join(lines) + '\n\n')
+
+        header = self._recv(16)
+        status = header[:3]
+        body = self._recv(int(header[4:15]))
+        if status != '200':
+            raise LivestatusError(body.strip())
+        return [dict(zip(columns, row)) for row in json.loads(body)]
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+    def _recv(self, size):
+        chunks = []
+        while size > 0:
+            buf = self.client.recv(min(size, 65536))
+            if not buf:
+                raise LivestatusError('livestatus closed the connection')
+            chunks.append(buf)
+            size -= len(buf)
+        return ''.join(chunks)
+
+
+class NagiosState(object):
+    """
+    Current notification and downtime state of a set of hosts, loaded
+    with one query per Livestatus table and used to drop external
+    commands that would not change anything.
+    """
+
+    HOST_COMMANDS = {
+        'SCHEDULE_HOST_DOWNTIME': ('scheduled_downtime_depth', True),
+        'DISABLE_HOST_NOTIFICATIONS': ('notifications_enabled', False),
+        'ENABLE_HOST_NOTIFICATIONS': ('notifications_enabled', True),
+    }
+
+    SVC_COMMANDS = {
+        'SCHEDULE_SVC_DOWNTIME': ('scheduled_downtime_depth', True),
+        'DISABLE_SVC_NOTIFICATIONS': ('notifications_enabled', False),
+        'ENABLE_SVC_NOTIFICATIONS': ('notifications_enabled', True),
+    }
+
+    HOST_SVC_COMMANDS = {
+        'SCHEDULE_HOST_SVC_DOWNTIME': ('scheduled_downtime_depth', True),
+        'DISABLE_HOST_SVC_NOTIFICATIONS': ('notifications_enabled', False),
+        'ENABLE_HOST_SVC_NOTIFICATIONS': ('notifications_enabled', True),
+    }
+
+    GLOBAL_COMMANDS = {
+        'DISABLE_NOTIFICATIONS': ('enable_notifications', False),
+        'ENABLE_NOTIFICATIONS': ('enable_notifications', True),
+    }
+
+    def __init__(self, livestatus, hosts, with_status=False):
+        self.hosts = {}
+        self.services = {}
+        self.host_services = {}
+        self.status = {}
+
+        filters = ['name = %s' % h for h in hosts]
+        if filters:
+            for row in livestatus.query('hosts', ['name', 'notifications_enabled',
+                                                   'scheduled_downtime_depth'],
+                                        filters):
+                self.hosts[row['name']] = row
+
+            filters = ['host_name = %s' % h for h in hosts]
+            for row in livestatus.query('services', ['host_name', 'description',
+                                                      'notifications_enabled',
+                                                      'scheduled_downtime_depth'],
+                                        filters):
+                self.services[(row['host_name'], row['description'])] = row
+                self.host_services.setdefault(row['host_name'], []).append(row)
+
+        if with_status:
+            rows = livestatus.query('status', ['enable_notifications'])
+            if rows:
+                self.status = rows[0]
+
+    def _in_state(self, row, column, wanted):
+        if row is None:
+            return False
+        if column == 'scheduled_downtime_depth':
+            return (row[column] > 0) == wanted
+        return bool(row[column]) == wanted
+
+    def needed(self, cmd):
+        """
+        Return False when the command would not change the current state.
+        Commands that are not tracked are always needed.
+        """
+
+        fields = cmd.split('] ', 1)[-1].strip().split(';')
+        name = fields[0]
+
+        if name in self.GLOBAL_COMMANDS:
+            column, wanted = self.GLOBAL_COMMANDS[name]
+            return not (self.status and self._in_state(self.status, column, wanted))
+        if len(fields) < 2:
+            return True
+        host = fields[1]
+        if name in self.HOST_COMMANDS:
+            column, wanted = self.HOST_COMMANDS[name]
+            return not self._in_state(self.hosts.get(host), column, wanted)
+        if name in self.SVC_COMMANDS and len(fields) > 2:
+            column, wanted = self.SVC_COMMANDS[name]
+            return not self._in_state(self.services.get((host, fields[2])), column, wanted)
+        if name in self.HOST_SVC_COMMANDS:
+            column, wanted = self.HOST_SVC_COMMANDS[name]
+            rows = self.host_services.get(host)
+            if not rows:
+                return True
+            for row in rows:
+                if not self._in_state(row, column, wanted):
+                    return True
+            return False
+        return True
+
+
 def main():
     ACTION_CHOICES = [
         'downtime',
@@ -204,6 +390,7 @@ def main():
             cmdfile=dict(default=which_cmdfile()),
             services=dict(default=None, aliases=['service']),
             command=dict(required=False, default=None),
+            livestatus=dict(required=False, default=None),
             )
         )
 
@@ -299,10 +486,15 @@ class Nagios(object):
         self.author = kwargs['author']
         self.comment = kwargs['comment']
         self.host = kwargs['host']
+        if self.host is None:
+            self.hosts = []
+        else:
+            self.hosts = [h.strip() for h in self.host.split(',') if h.strip()]
         self.servicegroup = kwargs['servicegroup']
         self.minutes = int(kwargs['minutes'])
         self.cmdfile = kwargs['cmdfile']
         self.command = kwargs['command']
+        self.livestatus = kwargs['livestatus']
 
         if (kwargs['services'] is None) or (kwargs['services'] == 'host') or (kwargs['services'] == 'all'):
             self.services = kwargs['services']
@@ -310,6 +502,7 @@ class Nagios(object):
             self.services = kwargs['services'].split(',')
 
         self.command_results = []
+        self.pending_commands = []
 
     def _now(self):
         """
@@ -320,19 +513,97 @@ class Nagios(object):
 
     def _write_command(self, cmd):
         """
-        Write the given command to the Nagios command file
+        Queue the given command for the Nagios command file. Queued
+        commands are written by _flush_commands.
         """
 
+        self.pending_commands.append(cmd)
+
+    def _flush_commands(self):
+        """
+        Write all queued commands to the Nagios command file, opening
+        it only once.
+
+        Commands are packed into writes of at most PIPE_BUF bytes, which
+        a FIFO delivers atomically, so no command is split or
+        interleaved with writes from other processes.
+        """
+
+        if self.livestatus:
+            self._drop_unneeded_commands()
+
+        if not self.pending_commands:
+            return
+
         try:
-            fp = open(self.cmdfile, 'w')
-            fp.write(cmd)
-            fp.flush()
-            fp.close()
-            self.command_results.append(cmd.strip())
-        except IOError:
+            fd = os.open(self.cmdfile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+            try:
+                try:
+                    pipe_buf = os.fpathconf(fd, 'PC_PIPE_BUF')
+                except (OSError, ValueError):
+                    pipe_buf = PIPE_BUF
+                for chunk in self._pack_commands(pipe_buf):
+                    while chunk:
+                        written = os.write(fd, chunk)
+                        chunk = chunk[written:]
+            finally:
+                os.close(fd)
+        except (IOError, OSError):
             self.module.fail_json(msg='unable to write to nagios command file',
                                   cmdfile=self.cmdfile)
 
+        for cmd in self.pending_commands:
+            self.command_results.append(cmd.strip())
+        self.pending_commands = []
+
+    def _drop_unneeded_commands(self):
+        """
+        Query the current state through Livestatus, once for all queued
+        commands, and drop the commands that are already in effect.
+        """
+
+        hosts = []
+        with_status = False
+        for cmd in self.pending_commands:
+            fields = cmd.split('] ', 1)[-1].strip().split(';')
+            if fields[0] in NagiosState.GLOBAL_COMMANDS:
+                with_status = True
+            elif fields[0] in NagiosState.HOST_COMMANDS or \
+                    fields[0] in NagiosState.SVC_COMMANDS or \
+                    fields[0] in NagiosState.HOST_SVC_COMMANDS:
+                if len(fields) > 1 and fields[1] not in hosts:
+                    hosts.append(fields[1])
+
+        livestatus = Livestatus(self.livestatus)
+        try:
+            try:
+                state = NagiosState(livestatus, hosts, with_status)
+            finally:
+                livestatus.close()
+        except (socket.error, LivestatusError, ValueError), e:
+            self.module.fail_json(msg='unable to query livestatus socket: %s' % e,
+                                  livestatus=self.livestatus)
+
+        self.pending_commands = [cmd for cmd in self.pending_commands
+                                 if state.needed(cmd)]
+
+    def _pack_commands(self, size):
+        """
+        Join the queued commands into chunks of at most size bytes.
+        A command longer than size is sent in a chunk of its own.
+        """
+
+        chunks = []
+        chunk = ''
+        for cmd in self.pending_commands:
+            if chunk and len(chunk) + len(cmd) > size:
+                chunks.append(chunk)
+                chunk = ''
+            chunk += cmd
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
     def _fmt_dt_str(self, cmd, host, duration, author=None,
                     comment=None, start=None,
                     svc=None, fixed=1, trigger=0):
@@ -883,14 +1154,15 @@ class Nagios(object):
         """
         # host or service downtime?
         if self.action == 'downtime':
-            if self.services == 'host':
-                self.schedule_host_downtime(self.host, self.minutes)
-            elif self.services == 'all':
-                self.schedule_host_svc_downtime(self.host, self.minutes)
-            else:
-                self.schedule_svc_downtime(self.host,
-                                           services=self.services,
-                                           minutes=self.minutes)
+            for host in self.hosts:
+                if self.services == 'host':
+                    self.schedule_host_downtime(host, self.minutes)
+                elif self.services == 'all':
+                    self.schedule_host_svc_downtime(host, self.minutes)
+                else:
+                    self.schedule_svc_downtime(host,
+                                               services=self.services,
+                                               minutes=self.minutes)
         elif self.action == "servicegroup_host_downtime":
             if self.servicegroup:
                 self.schedule_servicegroup_host_downtime(servicegroup = self.servicegroup, minutes = self.minutes)
@@ -900,29 +1172,33 @@ class Nagios(object):
 
         # toggle the host AND service alerts
         elif self.action == 'silence':
-            self.silence_host(self.host)
+            for host in self.hosts:
+                self.silence_host(host)
 
         elif self.action == 'unsilence':
-            self.unsilence_host(self.host)
+            for host in self.hosts:
+                self.unsilence_host(host)
 
         # toggle host/svc alerts
         elif self.action == 'enable_alerts':
-            if self.services == 'host':
-                self.enable_host_notifications(self.host)
-            elif self.services == 'all':
-                self.enable_host_svc_notifications(self.host)
-            else:
-                self.enable_svc_notifications(self.host,
-                                              services=self.services)
+            for host in self.hosts:
+                if self.services == 'host':
+                    self.enable_host_notifications(host)
+                elif self.services == 'all':
+                    self.enable_host_svc_notifications(host)
+                else:
+                    self.enable_svc_notifications(host,
+                                                  services=self.services)
 
         elif self.action == 'disable_alerts':
-            if self.services == 'host':
-                self.disable_host_notifications(self.host)
-            elif self.services == 'all':
-                self.disable_host_svc_notifications(self.host)
-            else:
-                self.disable_svc_notifications(self.host,
-                                               services=self.services)
+            for host in self.hosts:
+                if self.services == 'host':
+                    self.disable_host_notifications(host)
+                elif self.services == 'all':
+                    self.disable_host_svc_notifications(host)
+                else:
+                    self.disable_svc_notifications(host,
+                                                   services=self.services)
         elif self.action == 'silence_nagios':
             self.silence_nagios()
 
@@ -937,8 +1213,14 @@ class Nagios(object):
             self.module.fail_json(msg="unknown action specified: '%s'" % \
                                       self.action)
 
+        self._flush_commands()
+        # without livestatus nothing is known about the current state, so
+        # every run reports a change as it always did
+        changed = True
+        if self.livestatus:
+            changed = bool(self.command_results)
         self.module.exit_json(nagios_commands=self.command_results,
-                              changed=True)
+                              changed=changed)
 
 ######################################################################
 # import module snippets
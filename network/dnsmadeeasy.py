@@ -73,6 +73,22 @@ options:
     choices: [ 'present', 'absent' ]
     default: null
     
+  records:
+    description:
+      - "List of records to reconcile against the domain in one run, as an alternative to record_name. Each entry is a dictionary with name, type, value and an optional ttl (defaults to record_ttl). SRV records are not supported."
+      - "With state=present, missing records are created and differing ones updated; with state=absent the listed records are deleted. Changes are sent with the batch createMulti, updateMulti and multi-delete API calls."
+    required: false
+    default: null
+    version_added: "2.1"
+
+  purge_records:
+    description:
+      - "With records and state=present, also delete the domain's A, AAAA, CNAME, HTTPRED, PTR, MX, NS and TXT records that are not in records."
+    required: false
+    default: 'no'
+    choices: ['yes', 'no']
+    version_added: "2.1"
+
   validate_certs:
     description:
       - If C(no), SSL certificates will not be validated. This should only be used
@@ -105,6 +121,18 @@ EXAMPLES = '''
 - dnsmadeeasy: account_key=key account_secret=secret domain=my.com state=present record_name="test"
   register: response
   
+# reconcile a set of records, removing any other record of the domain
+- dnsmadeeasy:
+    account_key: key
+    account_secret: secret
+    domain: my.com
+    state: present
+    purge_records: yes
+    records:
+      - { name: www, type: A, value: 192.168.0.1 }
+      - { name: api, type: CNAME, value: www, ttl: 300 }
+      - { name: "", type: MX, value: "10 mail.my.com." }
+
 # delete a record / ensure it is absent
 - dnsmadeeasy: account_key=key account_secret=secret domain=my.com state=absent record_name="test"
 '''
@@ -124,6 +152,12 @@ try:
 except ImportError, e:
     IMPORT_ERROR = str(e)
 
+# Number of records sent in one createMulti, updateMulti or multi-delete call
+RECORD_BATCH_SIZE = 100
+
+SINGLE_VALUE_TYPES = ["A", "AAAA", "CNAME", "HTTPRED", "PTR"]
+MULTI_VALUE_TYPES = ["MX", "NS", "TXT"]
+
 class DME2:
 
     def __init__(self, apikey, secret, domain, module):
@@ -136,7 +170,7 @@ class DME2:
         self.domain_map = None      # ["domain_name"] => ID
         self.record_map = None      # ["record_name"] => ID
         self.records = None         # ["record_ID"] => <record>
-        self.all_records = None
+        self.record_index = None    # [(name, type)] => [<record>, ...]
 
         # Lookup the domain ID if passed as a domain name vs. ID
         if not self.domain.isdigit():
@@ -201,22 +235,23 @@ class DME2:
     # there can be several records with different types for a single name.
     def getMatchingRecord(self, record_name, record_type, record_value):
         # Get all the records if not already cached
-        if not self.all_records:
-            self.all_records = self.getRecords()
+        if self.record_index is None:
+            self._indexRecords(self.getRecords())
+
+        candidates = self.record_index.get((record_name, record_type), [])
 
         # TODO SRV type not yet implemented
-        if record_type in ["A", "AAAA", "CNAME", "HTTPRED", "PTR"]:
-            for result in self.all_records:
-                if result['name'] == record_name and result['type'] == record_type:
-                    return result
+        if record_type in SINGLE_VALUE_TYPES:
+            if candidates:
+                return candidates[0]
             return False
-        elif record_type in ["MX", "NS", "TXT"]:
-            for result in self.all_records:
-                if record_type == "MX":
-                    value = record_value.split(" ")[1]
-                else:
-                    value = record_value
-                if result['name'] == record_name and result['type'] == record_type and result['value'] == value:
+        elif record_type in MULTI_VALUE_TYPES:
+            if record_type == "MX":
+                value = record_value.split(" ")[1]
+            else:
+                value = record_value
+            for result in candidates:
+                if result['value'] == value:
                     return result
             return False
         else:
@@ -225,6 +260,36 @@ class DME2:
     def getRecords(self):
         return self.query(self.record_url, 'GET')['data']
 
+    def getIndexedRecords(self):
+        if self.record_index is None:
+            self._indexRecords(self.getRecords())
+
+        records = []
+        for candidates in self.record_index.values():
+            records.extend(candidates)
+        return records
+
+    def _indexRecords(self, records):
+        self.record_index = {}
+        for record in records:
+            self._addToIndex(record)
+
+    def _addToIndex(self, record):
+        if self.record_index is not None and record and 'name' in record:
+            self.record_index.setdefault((record['name'], record['type']), []).append(record)
+
+    def _removeFromIndex(self, record_id):
+        if self.record_index is None:
+            return
+        for key, candidates in self.record_index.items():
+            remaining = [r for r in candidates if str(r['id']) != str(record_id)]
+            if len(remaining) != len(candidates):
+                if remaining:
+                    self.record_index[key] = remaining
+                else:
+                    del self.record_index[key]
+                return
+
     def _instMap(self, type):
         #@TODO cache this call so it's executed only once per ansible execution
         map = {}
@@ -244,22 +309,129 @@ class DME2:
         return json.dumps(data, separators=(',', ':'))
 
     def createRecord(self, data):
-        #@TODO update the cache w/ resultant record + id when impleneted
-        return self.query(self.record_url, 'POST', data)
+        record = self.query(self.record_url, 'POST', data)
+        self._addToIndex(record)
+        return record
 
     def updateRecord(self, record_id, data):
-        #@TODO update the cache w/ resultant record + id when impleneted
-        return self.query(self.record_url + '/' + str(record_id), 'PUT', data)
+        result = self.query(self.record_url + '/' + str(record_id), 'PUT', data)
+        self._removeFromIndex(record_id)
+        record = json.loads(data)
+        record['id'] = record_id
+        self._addToIndex(record)
+        return result
 
     def deleteRecord(self, record_id):
-        #@TODO remove record from the cache when impleneted
-        return self.query(self.record_url + '/' + str(record_id), 'DELETE')
+        result = self.query(self.record_url + '/' + str(record_id), 'DELETE')
+        self._removeFromIndex(record_id)
+        return result
+
+    def createRecords(self, records):
+        created = []
+        for i in range(0, len(records), RECORD_BATCH_SIZE):
+            batch = records[i:i + RECORD_BATCH_SIZE]
+            result = self.query(self.record_url + '/createMulti', 'POST', self.prepareRecord(batch))
+            if isinstance(result, list):
+                for record in result:
+                    self._addToIndex(record)
+                created.extend(result)
+            else:
+                created.extend(batch)
+        return created
+
+    def updateRecords(self, records):
+        for i in range(0, len(records), RECORD_BATCH_SIZE):
+            batch = records[i:i + RECORD_BATCH_SIZE]
+            self.query(self.record_url + '/updateMulti', 'PUT', self.prepareRecord(batch))
+            for record in batch:
+                self._removeFromIndex(record['id'])
+                self._addToIndex(record)
+
+    def deleteRecords(self, record_ids):
+        for i in range(0, len(record_ids), RECORD_BATCH_SIZE):
+            batch = record_ids[i:i + RECORD_BATCH_SIZE]
+            self.query(self.record_url + '?' + urllib.urlencode([('ids', record_id) for record_id in batch]), 'DELETE')
+            for record_id in batch:
+                self._removeFromIndex(record_id)
 
 
 # ===========================================
 # Module execution.
 #
 
+def buildRecord(record_name, record_type, record_value, record_ttl):
+    new_record = {'name': record_name}
+    if record_value is not None:
+        new_record['value'] = record_value
+    if record_type is not None:
+        new_record['type'] = record_type
+    if record_ttl is not None:
+        new_record['ttl'] = record_ttl
+    # Special handling for mx record
+    if new_record.get("type") == "MX" and "value" in new_record:
+        new_record["mxLevel"] = new_record["value"].split(" ")[0]
+        new_record["value"] = new_record["value"].split(" ")[1]
+    return new_record
+
+
+def recordKey(record):
+    if record['type'] in MULTI_VALUE_TYPES:
+        return (record['name'], record['type'], record['value'])
+    return (record['name'], record['type'])
+
+
+def syncRecords(DME, module, records, state, purge):
+    existing = {}
+    for record in DME.getIndexedRecords():
+        key = recordKey(record)
+        if key not in existing:
+            existing[key] = record
+
+    desired = {}
+    for record in records:
+        if not isinstance(record, dict) or record.get('name') is None or not record.get('type') or record.get('value') is None:
+            module.fail_json(msg="each entry in records requires name, type and value: %s" % record)
+        if record['type'] not in SINGLE_VALUE_TYPES + MULTI_VALUE_TYPES:
+            module.fail_json(msg="record type '%s' is not supported in records" % record['type'])
+        new_record = buildRecord(record['name'], record['type'], str(record['value']),
+                                 int(record.get('ttl', module.params['record_ttl'])))
+        desired[recordKey(new_record)] = new_record
+
+    to_create = []
+    to_update = []
+    to_delete = []
+    if state == 'present':
+        for key, new_record in desired.items():
+            current_record = existing.get(key)
+            if not current_record:
+                to_create.append(new_record)
+                continue
+            for i in new_record:
+                if str(current_record.get(i)) != str(new_record[i]):
+                    new_record['id'] = current_record['id']
+                    to_update.append(new_record)
+                    break
+        if purge:
+            for key, current_record in existing.items():
+                if key not in desired and current_record['type'] in SINGLE_VALUE_TYPES + MULTI_VALUE_TYPES:
+                    to_delete.append(current_record['id'])
+    else:
+        for key in desired:
+            if key in existing:
+                to_delete.append(existing[key]['id'])
+
+    created = []
+    if to_create:
+        created = DME.createRecords(to_create)
+    if to_update:
+        DME.updateRecords(to_update)
+    if to_delete:
+        DME.deleteRecords(to_delete)
+
+    module.exit_json(changed=bool(to_create or to_update or to_delete),
+                     created=created, updated=to_update, deleted=to_delete)
+
+
 def main():
 
     module = AnsibleModule(
@@ -274,10 +446,13 @@ def main():
             record_value=dict(required=False),
             record_ttl=dict(required=False, default=1800, type='int'),
             validate_certs = dict(default='yes', type='bool'),
+            records=dict(required=False, type='list'),
+            purge_records=dict(default='no', type='bool'),
         ),
         required_together=(
             ['record_value', 'record_ttl', 'record_type']
-        )
+        ),
+        mutually_exclusive=[['records', 'record_name']]
     )
 
     if IMPORT_ERROR:
@@ -290,6 +465,9 @@ def main():
     record_type = module.params["record_type"]
     record_value = module.params["record_value"]
 
+    if module.params["records"] is not None:
+        syncRecords(DME, module, module.params["records"], state, module.params["purge_records"])
+
     # Follow Keyword Controlled Behavior
     if record_name is None:
         domain_records = DME.getRecords()
@@ -300,14 +478,7 @@ def main():
 
     # Fetch existing record + Build new one
     current_record = DME.getMatchingRecord(record_name, record_type, record_value)
-    new_record = {'name': record_name}
-    for i in ["record_value", "record_type", "record_ttl"]:
-        if not module.params[i] is None:
-            new_record[i[len("record_"):]] = module.params[i]
-    # Special handling for mx record
-    if new_record["type"] == "MX":
-        new_record["mxLevel"] = new_record["value"].split(" ")[0]
-        new_record["value"] = new_record["value"].split(" ")[1]
+    new_record = buildRecord(record_name, record_type, record_value, module.params["record_ttl"])
 
     # Compare new record against existing one
     changed = False
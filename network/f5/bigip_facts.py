@@ -91,6 +91,47 @@ options:
         default: null
         choices: []
         aliases: []
+    workers:
+        description:
+            - Number of concurrent iControl sessions used to collect facts.
+              Includes and their per-field getters are spread across the
+              sessions; additional sessions always use BIG-IP session support.
+              Per-include and per-field wall-clock timings are returned in
+              C(timings).
+        required: false
+        default: 1
+        version_added: "2.1"
+    fields:
+        description:
+            - Dictionary mapping a fact category to the list of fields to
+              collect for it. Only the iControl getters for the listed
+              fields are called. Categories that are not listed collect all
+              of their fields. Unknown field names fail the task. Not
+              applicable for certificate, key, software and system_info
+              fact categories.
+        required: false
+        default: null
+        version_added: "2.1"
+    snapshot:
+        description:
+            - Path of a JSON file on the host running the module where
+              collected facts are saved for use by later I(incremental) runs.
+        required: false
+        default: null
+        version_added: "2.1"
+    incremental:
+        description:
+            - If C(yes), the configuration fields of objects already present
+              in I(snapshot) are reused, and only objects whose names are new
+              are queried for them. Status fields such as C(object_status),
+              C(member) or C(monitor_status) are queried again for every
+              object on each run. Removed objects are dropped. Changes to the
+              configuration of cached objects are not seen; run with C(no)
+              to rebuild the snapshot.
+        required: false
+        default: 'no'
+        choices: ['yes', 'no']
+        version_added: "2.1"
 '''
 
 EXAMPLES = '''
@@ -110,6 +151,27 @@ EXAMPLES = '''
       password=mysecret
       include=interface,vlan
 
+  - name: Collect BIG-IP LTM facts over four concurrent sessions
+    local_action: >
+      bigip_facts
+      server=lb.mydomain.com
+      user=admin
+      password=mysecret
+      include=virtual_server,pool,node
+      workers=4
+
+  - name: Collect pool members and status, reusing the last snapshot
+    local_action:
+      module: bigip_facts
+      server: lb.mydomain.com
+      user: admin
+      password: mysecret
+      include: pool
+      fields:
+        pool: ['member', 'object_status']
+      snapshot: /var/cache/bigip/lb.mydomain.com.json
+      incremental: yes
+
 '''
 
 try:
@@ -120,7 +182,16 @@ except ImportError:
 else:
     bigsuds_found = True
 
+import copy
 import fnmatch
+try:
+    import json
+except ImportError:
+    import simplejson as json
+import os
+import Queue
+import threading
+import time
 import traceback
 import re
 
@@ -1365,6 +1436,12 @@ class SystemInfo(object):
         return self.api.System.SystemInfo.get_uptime()
 
 
+def merge_field_lists(result_dict, names, supported_fields, lists):
+    for i, j in enumerate(names):
+        temp = result_dict.setdefault(j, {})
+        temp.update([(item[0], item[1][i]) for item in zip(supported_fields, lists)])
+    return result_dict
+
 def generate_dict(api_obj, fields):
     result_dict = {}
     lists = []
@@ -1378,10 +1455,7 @@ def generate_dict(api_obj, fields):
             else:
                 lists.append(api_response)
                 supported_fields.append(field)
-        for i, j in enumerate(api_obj.get_list()):
-            temp = {}
-            temp.update([(item[0], item[1][i]) for item in zip(supported_fields, lists)])
-            result_dict[j] = temp
+        merge_field_lists(result_dict, api_obj.get_list(), supported_fields, lists)
     return result_dict
 
 def generate_simple_dict(api_obj, fields):
@@ -1395,7 +1469,7 @@ def generate_simple_dict(api_obj, fields):
             result_dict[field] = api_response
     return result_dict
 
-def generate_interface_dict(f5, regex):
+def generate_interface_dict(f5, regex, collect=generate_dict):
     interfaces = Interfaces(f5.get_api(), regex)
     fields = ['active_media', 'actual_flow_control', 'bundle_state',
               'description', 'dual_media_state', 'enabled_state', 'if_index',
@@ -1407,26 +1481,26 @@ def generate_interface_dict(f5, regex):
               'sfp_media_state', 'stp_active_edge_port_state',
               'stp_enabled_state', 'stp_link_type',
               'stp_protocol_detection_reset_state']
-    return generate_dict(interfaces, fields)
+    return collect(interfaces, fields)
 
-def generate_self_ip_dict(f5, regex):
+def generate_self_ip_dict(f5, regex, collect=generate_dict):
     self_ips = SelfIPs(f5.get_api(), regex)
     fields = ['address', 'allow_access_list', 'description',
               'enforced_firewall_policy', 'floating_state', 'fw_rule',
               'netmask', 'staged_firewall_policy', 'traffic_group',
               'vlan', 'is_traffic_group_inherited']
-    return generate_dict(self_ips, fields)
+    return collect(self_ips, fields)
 
-def generate_trunk_dict(f5, regex):
+def generate_trunk_dict(f5, regex, collect=generate_dict):
     trunks = Trunks(f5.get_api(), regex)
     fields = ['active_lacp_state', 'configured_member_count', 'description',
               'distribution_hash_option', 'interface', 'lacp_enabled_state',
               'lacp_timeout_option', 'link_selection_policy', 'media_speed',
               'media_status', 'operational_member_count', 'stp_enabled_state',
               'stp_protocol_detection_reset_state']
-    return generate_dict(trunks, fields)
+    return collect(trunks, fields)
 
-def generate_vlan_dict(f5, regex):
+def generate_vlan_dict(f5, regex, collect=generate_dict):
     vlans = Vlans(f5.get_api(), regex)
     fields = ['auto_lasthop', 'cmp_hash_algorithm', 'description',
               'dynamic_forwarding', 'failsafe_action', 'failsafe_state',
@@ -1435,9 +1509,9 @@ def generate_vlan_dict(f5, regex):
               'sflow_poll_interval', 'sflow_poll_interval_global',
               'sflow_sampling_rate', 'sflow_sampling_rate_global',
               'source_check_state', 'true_mac_address', 'vlan_id']
-    return generate_dict(vlans, fields)
+    return collect(vlans, fields)
 
-def generate_vs_dict(f5, regex):
+def generate_vs_dict(f5, regex, collect=generate_dict):
     virtual_servers = VirtualServers(f5.get_api(), regex)
     fields = ['actual_hardware_acceleration', 'authentication_profile',
               'auto_lasthop', 'bw_controller_policy', 'clone_pool',
@@ -1455,9 +1529,9 @@ def generate_vs_dict(f5, regex):
               'source_address_translation_type', 'source_port_behavior',
               'staged_firewall_policy', 'translate_address_state',
               'translate_port_state', 'type', 'vlan', 'wildmask']
-    return generate_dict(virtual_servers, fields)
+    return collect(virtual_servers, fields)
 
-def generate_pool_dict(f5, regex):
+def generate_pool_dict(f5, regex, collect=generate_dict):
     pools = Pools(f5.get_api(), regex)
     fields = ['action_on_service_down', 'active_member_count',
               'aggregate_dynamic_ratio', 'allow_nat_state',
@@ -1471,9 +1545,9 @@ def generate_pool_dict(f5, regex):
               'queue_on_connection_limit_state', 'queue_time_limit',
               'reselect_tries', 'server_ip_tos', 'server_link_qos',
               'simple_timeout', 'slow_ramp_time']
-    return generate_dict(pools, fields)
+    return collect(pools, fields)
 
-def generate_device_dict(f5, regex):
+def generate_device_dict(f5, regex, collect=generate_dict):
     devices = Devices(f5.get_api(), regex)
     fields = ['active_modules', 'base_mac_address', 'blade_addresses',
               'build', 'chassis_id', 'chassis_type', 'comment',
@@ -1483,49 +1557,49 @@ def generate_device_dict(f5, regex):
               'optional_modules', 'platform_id', 'primary_mirror_address',
               'product', 'secondary_mirror_address', 'software_version',
               'timelimited_modules', 'timezone', 'unicast_addresses']
-    return generate_dict(devices, fields)
+    return collect(devices, fields)
 
-def generate_device_group_dict(f5, regex):
+def generate_device_group_dict(f5, regex, collect=generate_dict):
     device_groups = DeviceGroups(f5.get_api(), regex)
     fields = ['all_preferred_active', 'autosync_enabled_state','description',
               'device', 'full_load_on_sync_state',
               'incremental_config_sync_size_maximum',
               'network_failover_enabled_state', 'sync_status', 'type']
-    return generate_dict(device_groups, fields)
+    return collect(device_groups, fields)
 
-def generate_traffic_group_dict(f5, regex):
+def generate_traffic_group_dict(f5, regex, collect=generate_dict):
     traffic_groups = TrafficGroups(f5.get_api(), regex)
     fields = ['auto_failback_enabled_state', 'auto_failback_time',
               'default_device', 'description', 'ha_load_factor',
               'ha_order', 'is_floating', 'mac_masquerade_address',
               'unit_id']
-    return generate_dict(traffic_groups, fields)
+    return collect(traffic_groups, fields)
 
-def generate_rule_dict(f5, regex):
+def generate_rule_dict(f5, regex, collect=generate_dict):
     rules = Rules(f5.get_api(), regex)
     fields = ['definition', 'description', 'ignore_vertification',
               'verification_status']
-    return generate_dict(rules, fields)
+    return collect(rules, fields)
 
-def generate_node_dict(f5, regex):
+def generate_node_dict(f5, regex, collect=generate_dict):
     nodes = Nodes(f5.get_api(), regex)
     fields = ['address', 'connection_limit', 'description', 'dynamic_ratio',
               'monitor_instance', 'monitor_rule', 'monitor_status',
               'object_status', 'rate_limit', 'ratio', 'session_status']
-    return generate_dict(nodes, fields)
+    return collect(nodes, fields)
 
-def generate_virtual_address_dict(f5, regex):
+def generate_virtual_address_dict(f5, regex, collect=generate_dict):
     virtual_addresses = VirtualAddresses(f5.get_api(), regex)
     fields = ['address', 'arp_state', 'auto_delete_state', 'connection_limit',
               'description', 'enabled_state', 'icmp_echo_state',
               'is_floating_state', 'netmask', 'object_status',
               'route_advertisement_state', 'traffic_group']
-    return generate_dict(virtual_addresses, fields)
+    return collect(virtual_addresses, fields)
 
-def generate_address_class_dict(f5, regex):
+def generate_address_class_dict(f5, regex, collect=generate_dict):
     address_classes = AddressClasses(f5.get_api(), regex)
     fields = ['address_class', 'description']
-    return generate_dict(address_classes, fields)
+    return collect(address_classes, fields)
 
 def generate_certificate_dict(f5, regex):
     certificates = Certificates(f5.get_api(), regex)
@@ -1535,7 +1609,7 @@ def generate_key_dict(f5, regex):
     keys = Keys(f5.get_api(), regex)
     return dict(zip(keys.get_list(), keys.get_key_list()))
 
-def generate_client_ssl_profile_dict(f5, regex):
+def generate_client_ssl_profile_dict(f5, regex, collect=generate_dict):
     profiles = ProfileClientSSL(f5.get_api(), regex)
     fields = ['alert_timeout', 'allow_nonssl_state', 'authenticate_depth',
               'authenticate_once_state', 'ca_file', 'cache_size',
@@ -1556,7 +1630,7 @@ def generate_client_ssl_profile_dict(f5, regex):
               'server_name', 'session_ticket_state', 'sni_default_state',
               'sni_require_state', 'ssl_option', 'strict_resume_state',
               'unclean_shutdown_state', 'is_base_profile', 'is_system_profile']
-    return generate_dict(profiles, fields)
+    return collect(profiles, fields)
 
 def generate_system_info_dict(f5):
     system_info = SystemInfo(f5.get_api())
@@ -1575,6 +1649,271 @@ def generate_software_list(f5):
     software_list = software.get_all_software_status()
     return software_list
 
+GENERATORS = {
+    'address_class': generate_address_class_dict,
+    'client_ssl_profile': generate_client_ssl_profile_dict,
+    'device': generate_device_dict,
+    'device_group': generate_device_group_dict,
+    'interface': generate_interface_dict,
+    'node': generate_node_dict,
+    'pool': generate_pool_dict,
+    'rule': generate_rule_dict,
+    'self_ip': generate_self_ip_dict,
+    'traffic_group': generate_traffic_group_dict,
+    'trunk': generate_trunk_dict,
+    'virtual_address': generate_virtual_address_dict,
+    'virtual_server': generate_vs_dict,
+    'vlan': generate_vlan_dict,
+}
+
+SIMPLE_GENERATORS = {
+    'certificate': generate_certificate_dict,
+    'key': generate_key_dict,
+    'software': generate_software_list,
+    'system_info': generate_system_info_dict,
+}
+
+
+# Runtime state that changes without any configuration change. These are
+# queried for every object on each run and never reused from a snapshot.
+VOLATILE_FIELDS = frozenset([
+    'active_lacp_state', 'active_media', 'active_member_count',
+    'actual_flow_control', 'actual_hardware_acceleration',
+    'blade_temperature', 'bundle_state', 'failover_state', 'media_status',
+    'member', 'monitor_instance', 'monitor_status', 'object_status',
+    'operational_member_count', 'session_status', 'sync_status',
+    'verification_status',
+])
+
+
+class UnknownFieldsError(Exception):
+    pass
+
+
+class CollectionEngine(object):
+    """Concurrent fact collection engine.
+
+    Runs fact includes and their per-field iControl getters over a bounded
+    pool of bigsuds sessions, one worker thread per session. Field getters
+    can be restricted per include, and the configuration fields of objects
+    already present in a previous snapshot can be reused instead of being
+    queried again. VOLATILE_FIELDS are always queried.
+
+    Attributes:
+        sessions: List of F5 instances, one per worker.
+        fields: Requested field names keyed by include name.
+        snapshot: Previously collected objects keyed by include name.
+        results: Collected facts keyed by include name.
+        timings: Wall-clock timings keyed by include name.
+    """
+
+    def __init__(self, sessions, fields=None, snapshot=None):
+        self.sessions = sessions
+        self.fields = fields or {}
+        self.snapshot = snapshot or {}
+        self.tasks = Queue.Queue()
+        self.lock = threading.Lock()
+        self.results = {}
+        self.timings = {}
+        self.collected = {}
+        self.pending = {}
+        self.states = {}
+        self.error = None
+
+    def add_include(self, name, generator, *args):
+        """Queue an include whose generator accepts a collect argument."""
+        self.tasks.put((self._run_include, (name, generator, args, True)))
+
+    def add_simple_include(self, name, generator, *args):
+        """Queue an include that is collected as a single task."""
+        self.tasks.put((self._run_include, (name, generator, args, False)))
+
+    def get_snapshot(self):
+        """Return the collected objects in snapshot form."""
+        snapshot = {}
+        for name, (fields, objects) in self.collected.items():
+            snapshot[name] = {'fields': fields, 'objects': objects}
+        return snapshot
+
+    def run(self):
+        threads = []
+        for f5 in self.sessions:
+            thread = threading.Thread(target=self._worker, args=(f5,))
+            thread.setDaemon(True)
+            thread.start()
+            threads.append(thread)
+        self.tasks.join()
+        for thread in threads:
+            self.tasks.put(None)
+        if self.error is not None:
+            raise self.error
+        return self.results
+
+    def _worker(self, f5):
+        while True:
+            task = self.tasks.get()
+            try:
+                if task is None:
+                    return
+                func, args = task
+                if self.error is None:
+                    func(f5, *args)
+            except Exception, e:
+                self.lock.acquire()
+                try:
+                    if self.error is None:
+                        self.error = e
+                finally:
+                    self.lock.release()
+            self.tasks.task_done()
+
+    def _run_include(self, f5, name, generator, args, fielded):
+        self.lock.acquire()
+        try:
+            self.pending[name] = 1
+            self.timings[name] = {'start': time.time(), 'fields': {}}
+        finally:
+            self.lock.release()
+        if fielded:
+            result = generator(f5, *args, **dict(collect=self._collector(name)))
+        else:
+            result = generator(f5, *args)
+        self.results[name] = result
+        self._task_done(name)
+
+    def _collector(self, name):
+        def collect(api_obj, fields):
+            result_dict = {}
+            if name in self.fields:
+                unknown = [x for x in self.fields[name] if x not in fields]
+                if unknown:
+                    raise UnknownFieldsError(
+                        "unknown fields for %s: %s, must be one or more of: %s"
+                        % (name, ",".join(unknown), ",".join(fields)))
+                fields = [x for x in fields if x in self.fields[name]]
+            names = api_obj.get_list()
+            static = [x for x in fields if x not in VOLATILE_FIELDS]
+            cached = self._cached_objects(name, static)
+            fetch_names = []
+            for object_name in names:
+                if object_name in cached:
+                    result_dict[object_name] = cached[object_name]
+                else:
+                    fetch_names.append(object_name)
+            self.collected[name] = (fields, result_dict)
+            self.timings[name]['cached'] = len(names) - len(fetch_names)
+            self.timings[name]['fetched'] = len(fetch_names)
+
+            # Each batch queries some fields for some names, so cached
+            # objects only get their volatile fields queried again.
+            batches = []
+            if len(fetch_names) == len(names):
+                if names:
+                    batches.append((api_obj, names, fields))
+            else:
+                if fetch_names:
+                    batches.append((restrict_api_object(api_obj, fetch_names),
+                                    fetch_names, static))
+                volatile = [x for x in fields if x in VOLATILE_FIELDS]
+                if volatile:
+                    batches.append((api_obj, names, volatile))
+
+            batches = [(batch_obj, {'names': batch_names,
+                                    'fields': batch_fields, 'responses': {}})
+                       for batch_obj, batch_names, batch_fields in batches
+                       if batch_fields]
+            if batches:
+                self.lock.acquire()
+                try:
+                    self.states[name] = {'batches': [x[1] for x in batches],
+                                         'result': result_dict}
+                    for batch_obj, batch in batches:
+                        self.pending[name] += len(batch['fields'])
+                finally:
+                    self.lock.release()
+                for batch_obj, batch in batches:
+                    for field in batch['fields']:
+                        self.tasks.put((self._run_field,
+                                        (name, batch, batch_obj, field)))
+            return result_dict
+        return collect
+
+    def _cached_objects(self, name, fields):
+        cached = self.snapshot.get(name)
+        if not cached or not set(fields).issubset(cached.get('fields', [])):
+            return {}
+        objects = {}
+        for object_name, values in cached.get('objects', {}).items():
+            objects[object_name] = dict([(k, v) for k, v in values.items()
+                                         if k in fields])
+        return objects
+
+    def _run_field(self, f5, name, batch, api_obj, field):
+        worker_obj = copy.copy(api_obj)
+        worker_obj.api = f5.get_api()
+        start = time.time()
+        try:
+            api_response = getattr(worker_obj, "get_" + field)()
+        except (MethodNotFound, WebFault):
+            pass
+        else:
+            batch['responses'][field] = api_response
+        self.timings[name]['fields'][field] = time.time() - start
+        self._task_done(name)
+
+    def _task_done(self, name):
+        self.lock.acquire()
+        try:
+            self.pending[name] -= 1
+            if self.pending[name]:
+                return
+            timing = self.timings[name]
+            timing['elapsed'] = time.time() - timing.pop('start')
+            state = self.states.pop(name, None)
+        finally:
+            self.lock.release()
+        if state is not None:
+            for batch in state['batches']:
+                responses = batch['responses']
+                supported_fields = [x for x in batch['fields'] if x in responses]
+                lists = [responses[x] for x in supported_fields]
+                merge_field_lists(state['result'], batch['names'],
+                                  supported_fields, lists)
+
+
+def restrict_api_object(api_obj, names):
+    """Return a copy of api_obj whose getters only query the given names."""
+    current = api_obj.get_list()
+    subset = copy.copy(api_obj)
+    for attr, value in vars(api_obj).items():
+        if value is current:
+            setattr(subset, attr, names)
+    return subset
+
+def load_snapshot(path):
+    if not os.path.exists(path):
+        return {}
+    snapshot_file = open(path)
+    try:
+        return json.load(snapshot_file)
+    finally:
+        snapshot_file.close()
+
+def save_snapshot(path, snapshot):
+    tmp_path = path + '.tmp'
+    snapshot_file = open(tmp_path, 'w')
+    try:
+        json.dump(snapshot, snapshot_file)
+    finally:
+        snapshot_file.close()
+    os.rename(tmp_path, path)
+
+def open_session(server, user, password, session, validate_certs):
+    f5 = F5(server, user, password, session, validate_certs)
+    f5.set_active_folder("/")
+    f5.enable_recursive_query_state()
+    return f5
+
 
 def main():
     module = AnsibleModule(
@@ -1586,6 +1925,10 @@ def main():
             session = dict(type='bool', default=False),
             include = dict(type='list', required=True),
             filter = dict(type='str', required=False),
+            workers = dict(type='int', default=1),
+            fields = dict(type='dict', required=False),
+            snapshot = dict(type='str', required=False),
+            incremental = dict(type='bool', default=False),
         )
     )
 
@@ -1598,6 +1941,9 @@ def main():
     validate_certs = module.params['validate_certs']
     session = module.params['session']
     fact_filter = module.params['filter']
+    workers = module.params['workers']
+    snapshot_path = module.params['snapshot']
+    incremental = module.params['incremental']
 
     if validate_certs:
         import ssl
@@ -1617,9 +1963,24 @@ def main():
     include_test = map(lambda x: x in valid_includes, include)
     if not all(include_test):
         module.fail_json(msg="value of include must be one or more of: %s, got: %s" % (",".join(valid_includes), ",".join(include)))
+    if workers < 1:
+        module.fail_json(msg="workers must be 1 or greater, got: %s" % workers)
+    if incremental and not snapshot_path:
+        module.fail_json(msg="incremental requires snapshot to be set")
+
+    fields = {}
+    for name, value in (module.params['fields'] or {}).items():
+        if name not in valid_includes:
+            module.fail_json(msg="keys of fields must be one or more of: %s, got: %s" % (",".join(valid_includes), name))
+        if name in SIMPLE_GENERATORS:
+            module.fail_json(msg="fields is not applicable for %s" % name)
+        if isinstance(value, basestring):
+            value = value.split(',')
+        fields[name] = [x.strip().lower() for x in value]
 
     try:
         facts = {}
+        timings = {}
 
         if len(include) > 0:
             f5 = F5(server, user, password, session, validate_certs)
@@ -1630,42 +1991,26 @@ def main():
             if saved_recursive_query_state != "STATE_ENABLED":
                 f5.enable_recursive_query_state()
 
-            if 'interface' in include:
-                facts['interface'] = generate_interface_dict(f5, regex)
-            if 'self_ip' in include:
-                facts['self_ip'] = generate_self_ip_dict(f5, regex)
-            if 'trunk' in include:
-                facts['trunk'] = generate_trunk_dict(f5, regex)
-            if 'vlan' in include:
-                facts['vlan'] = generate_vlan_dict(f5, regex)
-            if 'virtual_server' in include:
-                facts['virtual_server'] = generate_vs_dict(f5, regex)
-            if 'pool' in include:
-                facts['pool'] = generate_pool_dict(f5, regex)
-            if 'device' in include:
-                facts['device'] = generate_device_dict(f5, regex)
-            if 'device_group' in include:
-                facts['device_group'] = generate_device_group_dict(f5, regex)
-            if 'traffic_group' in include:
-                facts['traffic_group'] = generate_traffic_group_dict(f5, regex)
-            if 'rule' in include:
-                facts['rule'] = generate_rule_dict(f5, regex)
-            if 'node' in include:
-                facts['node'] = generate_node_dict(f5, regex)
-            if 'virtual_address' in include:
-                facts['virtual_address'] = generate_virtual_address_dict(f5, regex)
-            if 'address_class' in include:
-                facts['address_class'] = generate_address_class_dict(f5, regex)
-            if 'software' in include:
-                facts['software'] = generate_software_list(f5)
-            if 'certificate' in include:
-                facts['certificate'] = generate_certificate_dict(f5, regex)
-            if 'key' in include:
-                facts['key'] = generate_key_dict(f5, regex)
-            if 'client_ssl_profile' in include:
-                facts['client_ssl_profile'] = generate_client_ssl_profile_dict(f5, regex)
-            if 'system_info' in include:
-                facts['system_info'] = generate_system_info_dict(f5)
+            sessions = [f5]
+            for i in range(workers - 1):
+                sessions.append(open_session(server, user, password, True,
+                                             validate_certs))
+            snapshot = {}
+            if incremental:
+                snapshot = load_snapshot(snapshot_path)
+            engine = CollectionEngine(sessions, fields, snapshot)
+
+            for name in sorted(set(include)):
+                if name in ('software', 'system_info'):
+                    engine.add_simple_include(name, SIMPLE_GENERATORS[name])
+                elif name in ('certificate', 'key'):
+                    engine.add_simple_include(name, SIMPLE_GENERATORS[name], regex)
+                else:
+                    engine.add_include(name, GENERATORS[name], regex)
+            facts = engine.run()
+            timings = engine.timings
+            if snapshot_path:
+                save_snapshot(snapshot_path, engine.get_snapshot())
 
             # restore saved state
             if saved_active_folder and saved_active_folder != "/":
@@ -1674,8 +2019,10 @@ def main():
                saved_recursive_query_state != "STATE_ENABLED":
                 f5.set_recursive_query_state(saved_recursive_query_state)
 
-        result = {'ansible_facts': facts}
+        result = {'ansible_facts': facts, 'timings': timings}
 
+    except UnknownFieldsError, e:
+        module.fail_json(msg=str(e))
     except Exception, e:
         module.fail_json(msg="received exception: %s\ntraceback: %s" % (e, traceback.format_exc()))
 
@@ -39,9 +39,21 @@ options:
     default: auto-detected
   host:
     description:
-      - Name of the backend host to change.
-    required: true
+      - Name of the backend host to change. Required unless C(servers) is
+        given.
+    required: false
+    default: null
+  servers:
+    description:
+      - List of servers to change in a single run, as an alternative to
+        C(host). Each entry is a dictionary with a required C(host) key and
+        optional C(backend), C(state), C(weight) and C(shutdown_sessions)
+        keys; missing keys default to the module options of the same name.
+        All commands are sent in one socket exchange, and when C(wait) is set
+        every server is checked against a single C(show stat) per retry.
+    required: false
     default: null
+    version_added: "2.1"
   shutdown_sessions:
     description:
       - When disabling a server, immediately terminate all the sessions attached
@@ -56,10 +68,16 @@ options:
     default: /var/run/haproxy.sock
   state:
     description:
-      - Desired state of the provided backend host.
-    required: true
+      - Desired state of the provided backend host. Required when C(host) is
+        given.
+      - C(stats) changes nothing and returns the parsed C(show stat) table as
+        the C(haproxy_stats) fact, a list with one dictionary per proxy and
+        server line, limited to C(host) and C(backend) when they are given,
+        or to the C(host) and C(backend) of each C(servers) entry.
+        C(stats) was added in version 2.1.
+    required: false
     default: null
-    choices: [ "enabled", "disabled" ]
+    choices: [ "enabled", "disabled", "stats" ]
   wait:
     description:
       - Wait until the server reports a status of 'UP' when `state=enabled`, or
@@ -117,6 +135,26 @@ EXAMPLES = '''
 # enable server in 'www' backend pool with change server(s) weight
 - haproxy: state=enabled host={{ inventory_hostname }} socket=/var/run/haproxy.sock weight=10 backend=www
 
+# drain a rack in one run and wait until every server is in maintenance
+- haproxy:
+    state: disabled
+    wait: yes
+    servers:
+      - { host: web01, backend: www }
+      - { host: web02, backend: www }
+      - { host: api01, backend: api, shutdown_sessions: true }
+      - { host: web03, state: enabled, weight: 10 }
+
+# gather the per-server stats table of the 'www' backend as facts
+- haproxy: state=stats backend=www
+
+# gather stats for a few servers only
+- haproxy:
+    state: stats
+    servers:
+      - { host: web01, backend: www }
+      - { host: api01, backend: api }
+
 author: "Ravi Bhure (@ravibhure)"
 '''
 
@@ -126,8 +164,8 @@ import time
 
 
 DEFAULT_SOCKET_LOCATION="/var/run/haproxy.sock"
-RECV_SIZE = 1024
-ACTION_CHOICES = ['enabled', 'disabled']
+RECV_SIZE = 65536
+ACTION_CHOICES = ['enabled', 'disabled', 'stats']
 WAIT_RETRIES=25
 WAIT_INTERVAL=5
 
@@ -135,6 +173,98 @@ WAIT_INTERVAL=5
 class TimeoutException(Exception):
   pass
 
+class HAProxySession(object):
+    """
+    Persistent interactive-mode session on HAProxy's local UNIX socket.
+
+    The socket is switched to interactive mode with the 'prompt' command so
+    that it stays open between commands. Several command lines can be sent
+    in a single write; the responses are split on the prompt HAProxy prints
+    after each line has been processed.
+    """
+
+    PROMPT = '\n> '
+
+    def __init__(self, path):
+        self.path = path
+        self.client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.client.connect(self.path)
+        self.buffer = ''
+        self.client.sendall('prompt\n')
+        self._read_responses(1)
+
+    def execute(self, cmd):
+        return self.execute_many([cmd])[0]
+
+    def execute_many(self, cmds):
+        """
+        Pipelines a list of command lines in one write and returns their
+        responses in the same order.
+        """
+        self.client.sendall(''.join(['%s\n' % cmd for cmd in cmds]))
+        return self._read_responses(len(cmds))
+
+    def close(self):
+        try:
+            self.client.sendall('quit\n')
+        except socket.error:
+            pass
+        self.client.close()
+
+    def _read_responses(self, count):
+        responses = []
+        data = self.buffer
+        start = 0
+        while len(responses) < count:
+            pos = data.find(self.PROMPT, start)
+            if pos == -1:
+                start = max(0, len(data) - len(self.PROMPT) + 1)
+                buf = self.client.recv(RECV_SIZE)
+                if not buf:
+                    raise socket.error("HAProxy closed the socket connection")
+                data += buf
+                continue
+            responses.append(data[:pos])
+            data = data[pos + len(self.PROMPT):]
+            start = 0
+        self.buffer = data
+        return responses
+
+class StatSnapshot(object):
+    """
+    One 'show stat' output parsed with csv and indexed by (pxname, svname),
+    so lookups do not rescan the output.
+    """
+
+    def __init__(self, data):
+        self.rows = []
+        self.index = {}
+        data = data.lstrip('# ')
+        for row in csv.DictReader(data.splitlines()):
+            # show stat ends every line with a comma
+            row.pop('', None)
+            self.rows.append(row)
+            self.index[(row['pxname'], row['svname'])] = row
+
+    def get(self, pxname, svname):
+        return self.index.get((pxname, svname))
+
+    def backends(self):
+        return [row['pxname'] for row in self.rows if row['svname'] == 'BACKEND']
+
+    def select(self, svname=None, pxname=None):
+        """
+        Returns the rows matching the given server and backend names.
+        """
+        if svname is not None and pxname is not None:
+            row = self.get(pxname, svname)
+            if row is None:
+                return []
+            return [row]
+        return [row for row in self.rows
+                if (svname is None or row['svname'] == svname)
+                and (pxname is None or row['pxname'] == pxname)]
+
 class HAProxy(object):
     """
     Used for communicating with HAProxy through its local UNIX socket interface.
@@ -160,6 +290,7 @@ class HAProxy(object):
         self.wait_retries = self.module.params['wait_retries']
         self.wait_interval = self.module.params['wait_interval']
         self.command_results = []
+        self.session = None
         self.status_servers = []
         self.status_weights = []
         self.previous_weights = []
@@ -172,20 +303,24 @@ class HAProxy(object):
         Executes a HAProxy command by sending a message to a HAProxy's local
         UNIX socket and waiting up to 'timeout' milliseconds for the response.
         """
+        return self.execute_many([cmd], timeout, capture_output)[0]
 
-        self.client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-        self.client.connect(self.socket)
-        self.client.sendall('%s\n' % cmd)
-        result = ''
-        buf = ''
-        buf = self.client.recv(RECV_SIZE)
-        while buf:
-            result += buf
-            buf = self.client.recv(RECV_SIZE)
+    def execute_many(self, cmds, timeout=200, capture_output=True):
+        """
+        Executes several HAProxy command lines in one exchange over the
+        persistent socket session, which is opened on first use.
+        """
+        if self.session is None:
+            self.session = HAProxySession(self.socket)
+        results = self.session.execute_many(cmds)
         if capture_output:
-            self.command_results = result.strip()
-        self.client.close()
-        return result
+            self.command_results = '\n'.join([r.strip() for r in results]).strip()
+        return results
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
 
     def wait_until_status(self, pxname, svname, status):
         """
@@ -195,50 +330,146 @@ class HAProxy(object):
         not found, the module will fail.
         """
         for i in range(1, self.wait_retries):
-            data = self.execute('show stat', 200, False).lstrip('# ')
-            r = csv.DictReader(data.splitlines())
-            found = False
-            for row in r:
-                if row['pxname'] == pxname and row['svname'] == svname:
-                    found = True
-                    if row['status'] == status:
-                        return True;
-                    else:
-                        time.sleep(self.wait_interval)
-
-            if not found:
+            row = self.get_snapshot().get(pxname, svname)
+            if row is None:
                 self.module.fail_json(msg="unable to find server %s/%s" % (pxname, svname))
+            if row['status'] == status:
+                return True
+            time.sleep(self.wait_interval)
 
         self.module.fail_json(msg="server %s/%s not status '%s' after %d retries. Aborting." % (pxname, svname, status, self.wait_retries))
 
+    def get_snapshot(self):
+        """
+        Runs show stat once and returns it as a StatSnapshot.
+        """
+        return StatSnapshot(self.execute('show stat', 200, False))
+
+    def wait_until_all_status(self, targets):
+        """
+        Wait for every (pxname, svname, status) target to reach its status,
+        checking all of them against a single show stat per interval. The
+        module fails if a server is not found or if any server has not
+        reached its status after RETRIES attempts.
+        """
+        pending = list(targets)
+        for i in range(1, self.wait_retries):
+            snapshot = self.get_snapshot()
+            remaining = []
+            for pxname, svname, status in pending:
+                row = snapshot.get(pxname, svname)
+                if row is None:
+                    self.module.fail_json(msg="unable to find server %s/%s" % (pxname, svname))
+                if row['status'] != status:
+                    remaining.append((pxname, svname, status))
+            pending = remaining
+            if not pending:
+                return True
+            time.sleep(self.wait_interval)
+
+        self.module.fail_json(msg="servers not in the requested status after %d retries: %s. Aborting." % (self.wait_retries, ', '.join(["%s/%s (%s)" % t for t in pending])))
+
+    def act_bulk(self, servers):
+        """
+        Apply a list of server targets in one run: all commands are sent in
+        a single exchange and waits are checked together.
+        """
+        before = self.get_snapshot()
+        backends = before.backends()
+
+        cmds = []
+        targets = []
+        for server in servers:
+            if not isinstance(server, dict):
+                self.module.fail_json(msg="each entry in servers must be a dictionary, got: %s" % server)
+            svname = server.get('host')
+            state = server.get('state', self.state)
+            if not svname:
+                self.module.fail_json(msg="each entry in servers requires a host")
+            if state not in ('enabled', 'disabled'):
+                self.module.fail_json(msg="unknown state specified for %s: '%s'" % (svname, state))
+            if server.get('backend'):
+                pxnames = [server['backend']]
+            elif self.backend:
+                pxnames = [self.backend]
+            else:
+                pxnames = backends
+            for pxname in pxnames:
+                if state == 'enabled':
+                    cmds.append(self.enable_cmd(pxname, svname, server.get('weight', self.weight)))
+                    targets.append((pxname, svname, 'UP'))
+                else:
+                    shutdown_sessions = server.get('shutdown_sessions', self.shutdown_sessions)
+                    cmds.append(self.disable_cmd(pxname, svname, shutdown_sessions))
+                    targets.append((pxname, svname, 'MAINT'))
+
+        if cmds:
+            self.execute_many(cmds)
+        if self.wait and targets:
+            self.wait_until_all_status(targets)
+
+        after = self.get_snapshot()
+        self.close()
+
+        changed = False
+        for pxname, svname, status in targets:
+            old = before.get(pxname, svname) or {}
+            new = after.get(pxname, svname) or {}
+            if old.get('status') != new.get('status') or old.get('weight') != new.get('weight'):
+                changed = True
+                break
+        self.module.exit_json(stdout=self.command_results, changed=changed)
+
     def get_current_state(self, host, backend):
         """
-        Gets the each original state value from show stat. 
-        Runs before and after to determine if values are changed. 
-        This relies on weight always being the next element after 
-        status in "show stat" as well as status states remaining
-        as indicated in status_states and haproxy documentation.
+        Gets the status and weight of the host in each backend from one
+        parsed show stat. Runs before and after to determine if values are
+        changed.
         """
-   
-        output = self.execute('show stat')
-        output = output.lstrip('# ').strip()
-        output = output.split(',')
-        result = output
-        status_states = [ 'UP','DOWN','DRAIN','NOLB','MAINT' ]
-        self.status_server = []
-        status_weight_pos = []
-        self.status_weight = []
-
-        for check, status in enumerate(result):
-            if status in status_states:
-                self.status_server.append(status) 
-                status_weight_pos.append(check + 1) 
-
-        for weight in status_weight_pos:
-                self.status_weight.append(result[weight])
+        rows = self.get_snapshot().select(host, backend)
+        self.status_server = [row['status'] for row in rows]
+        self.status_weight = [row['weight'] for row in rows]
 
         return{'self.status_server':self.status_server, 'self.status_weight':self.status_weight}
 
+    def stats(self, host, backend, servers=None):
+        """
+        Stats action, returns the parsed show stat table as facts,
+        optionally limited to a host and/or backend, or to a list of
+        server targets.
+        """
+        snapshot = self.get_snapshot()
+        if servers:
+            rows = []
+            for server in servers:
+                if not isinstance(server, dict) or not server.get('host'):
+                    self.module.fail_json(msg="each entry in servers requires a host")
+                for row in snapshot.select(server['host'], server.get('backend') or backend):
+                    if row not in rows:
+                        rows.append(row)
+        else:
+            rows = snapshot.select(host, backend)
+        self.close()
+        self.module.exit_json(changed=False, ansible_facts=dict(haproxy_stats=rows))
+
+    def get_backends(self):
+        """
+        Returns the names of all backends reported by show stat.
+        """
+        return self.get_snapshot().backends()
+
+    def enable_cmd(self, pxname, svname, weight):
+        cmd = "get weight %s/%s ; enable server %s/%s" % (pxname, svname, pxname, svname)
+        if weight:
+            cmd += "; set weight %s/%s %s" % (pxname, svname, weight)
+        return cmd
+
+    def disable_cmd(self, pxname, svname, shutdown_sessions):
+        cmd = "get weight %s/%s ; disable server %s/%s" % (pxname, svname, pxname, svname)
+        if shutdown_sessions:
+            cmd += "; shutdown sessions server %s/%s" % (pxname, svname)
+        return cmd
+
     def enabled(self, host, backend, weight):
         """
         Enabled action, marks server to UP and checks are re-enabled,
@@ -247,30 +478,15 @@ class HAProxy(object):
         """
         svname = host
         if self.backend is None:
-            output = self.execute('show stat')
-            #sanitize and make a list of lines
-            output = output.lstrip('# ').strip()
-            output = output.split('\n')
-            result = output
-
-            for line in result:
-                if 'BACKEND' in line:
-                    result =  line.split(',')[0]
-                    pxname = result
-                    cmd = "get weight %s/%s ; enable server %s/%s" % (pxname, svname, pxname, svname)
-                    if weight:
-                        cmd += "; set weight %s/%s %s" % (pxname, svname, weight)
-                    self.execute(cmd)
-                    if self.wait:
-                        self.wait_until_status(pxname, svname, 'UP')
-
+            pxnames = self.get_backends()
         else:
-            pxname = backend
-            cmd = "get weight %s/%s ; enable server %s/%s" % (pxname, svname, pxname, svname)
-            if weight:
-                cmd += "; set weight %s/%s %s" % (pxname, svname, weight)
-            self.execute(cmd)
-            if self.wait:
+            pxnames = [backend]
+
+        cmds = [self.enable_cmd(pxname, svname, weight) for pxname in pxnames]
+        self.execute_many(cmds)
+
+        if self.wait:
+            for pxname in pxnames:
                 self.wait_until_status(pxname, svname, 'UP')
 
     def disabled(self, host, backend, shutdown_sessions):
@@ -281,30 +497,15 @@ class HAProxy(object):
         """
         svname = host
         if self.backend is None:
-            output = self.execute('show stat')
-            #sanitize and make a list of lines
-            output = output.lstrip('# ').strip()
-            output = output.split('\n')
-            result = output
-
-            for line in result:
-                if 'BACKEND' in line:
-                    result =  line.split(',')[0]
-                    pxname = result
-                    cmd = "get weight %s/%s ; disable server %s/%s" % (pxname, svname, pxname, svname)
-                    if shutdown_sessions:
-                        cmd += "; shutdown sessions server %s/%s" % (pxname, svname)
-                    self.execute(cmd)
-                    if self.wait:
-                        self.wait_until_status(pxname, svname, 'MAINT')
-
+            pxnames = self.get_backends()
         else:
-            pxname = backend
-            cmd = "get weight %s/%s ; disable server %s/%s" % (pxname, svname, pxname, svname)
-            if shutdown_sessions:
-                cmd += "; shutdown sessions server %s/%s" % (pxname, svname)
-            self.execute(cmd)
-            if self.wait:
+            pxnames = [backend]
+
+        cmds = [self.disable_cmd(pxname, svname, shutdown_sessions) for pxname in pxnames]
+        self.execute_many(cmds)
+
+        if self.wait:
+            for pxname in pxnames:
                 self.wait_until_status(pxname, svname, 'MAINT')
 
     def act(self):
@@ -330,6 +531,7 @@ class HAProxy(object):
         self.current_states = ','.join(self.status_server)
         self.current_weights = ','.join(self.status_weight)
 
+        self.close()
 
         if self.current_weights != self.previous_weights:
             self.module.exit_json(stdout=self.command_results, changed=True)  
@@ -343,8 +545,9 @@ def main():
     # load ansible module object
     module = AnsibleModule(
         argument_spec = dict(
-            state = dict(required=True, default=None, choices=ACTION_CHOICES),
-            host=dict(required=True, default=None),
+            state = dict(required=False, default=None, choices=ACTION_CHOICES),
+            host=dict(required=False, default=None),
+            servers=dict(required=False, default=None, type='list'),
             backend=dict(required=False, default=None),
             weight=dict(required=False, default=None),
             socket = dict(required=False, default=DEFAULT_SOCKET_LOCATION),
@@ -353,14 +556,26 @@ def main():
             wait_retries=dict(required=False, default=WAIT_RETRIES, type='int'),
             wait_interval=dict(required=False, default=WAIT_INTERVAL, type='int'),
         ),
-
+        mutually_exclusive=[['host', 'servers']],
     )
 
+    if module.params['state'] != 'stats':
+        if not module.params['host'] and not module.params['servers']:
+            module.fail_json(msg="one of the following is required: host,servers")
+        if module.params['host'] and not module.params['state']:
+            module.fail_json(msg="state is required when host is given")
+
     if not socket:
         module.fail_json(msg="unable to locate haproxy socket")
 
     ansible_haproxy = HAProxy(module)
-    ansible_haproxy.act()
+    if module.params['state'] == 'stats':
+        ansible_haproxy.stats(module.params['host'], module.params['backend'],
+                              module.params['servers'])
+    elif module.params['servers']:
+        ansible_haproxy.act_bulk(module.params['servers'])
+    else:
+        ansible_haproxy.act()
 
 # import module snippets
 from ansible.module_utils.basic import *
@@ -31,7 +31,15 @@ options:
     host:
         description:
             - Set to target snmp server (normally {{inventory_hostname}})
-        required: true
+            - Either I(host) or I(hosts) is required.
+        required: false
+    hosts:
+        description:
+            - List of snmp servers to poll concurrently from a single task.
+            - Facts for each device are returned under C(snmp_hosts) keyed by
+              host, devices that could not be polled are listed in C(failed_hosts).
+        required: false
+        version_added: "2.1"
     version:
         description:
             - SNMP Version to use, v2/v2c or v3
@@ -68,6 +76,25 @@ options:
         description:
             - Encryption key, required if version is authPriv
         required: false
+    max_repetitions:
+        description:
+            - Number of rows requested per GETBULK message when walking tables.
+        required: false
+        default: 25
+        version_added: "2.1"
+    oids:
+        description:
+            - Additional OID subtrees to walk. Every value found is returned in
+              C(ansible_snmp_oids) keyed by its numeric OID.
+        required: false
+        default: []
+        version_added: "2.1"
+    concurrency:
+        description:
+            - Maximum number of devices polled at the same time when using I(hosts).
+        required: false
+        default: 64
+        version_added: "2.1"
 '''
 
 EXAMPLES = '''
@@ -86,6 +113,25 @@ EXAMPLES = '''
     authkey=abc12345
     privkey=def6789
   delegate_to: localhost
+
+# Walk the ifHCInOctets column as well as the default facts
+- snmp_facts:
+    host: "{{ inventory_hostname }}"
+    version: v2c
+    community: public
+    oids:
+      - 1.3.6.1.2.1.31.1.1.1.6
+  connection: local
+
+# Poll every switch in a group from one task
+- snmp_facts:
+    hosts: "{{ groups['switches'] }}"
+    version: v2c
+    community: public
+    max_repetitions: 50
+  register: switch_facts
+  run_once: true
+  delegate_to: localhost
 '''
 
 from ansible.module_utils.basic import *
@@ -93,6 +139,8 @@ from collections import defaultdict
 
 try:
     from pysnmp.entity.rfc3413.oneliner import cmdgen
+    from pysnmp.proto.rfc1905 import EndOfMibView
+    from pysnmp.error import PySnmpError
     has_pysnmp = True
 except:
     has_pysnmp = False
@@ -173,66 +221,133 @@ def lookup_operstatus(int_operstatus):
     else:
         return ""
 
-def main():
-    module = AnsibleModule(
-        argument_spec=dict(
-            host=dict(required=True),
-            version=dict(required=True, choices=['v2', 'v2c', 'v3']),
-            community=dict(required=False, default=False),
-            username=dict(required=False),
-            level=dict(required=False, choices=['authNoPriv', 'authPriv']),
-            integrity=dict(required=False, choices=['md5', 'sha']),
-            privacy=dict(required=False, choices=['des', 'aes']),
-            authkey=dict(required=False),
-            privkey=dict(required=False),
-            removeplaceholder=dict(required=False)),
-            required_together = ( ['username','level','integrity','authkey'],['privacy','privkey'],),
-        supports_check_mode=False)
-
-    m_args = module.params
-
-    if not has_pysnmp:
-        module.fail_json(msg='Missing required pysnmp module (check docs)')
-
-    cmdGen = cmdgen.CommandGenerator()
-
-    # Verify that we receive a community when using snmp v2
-    if m_args['version'] == "v2" or m_args['version'] == "v2c":
-        if m_args['community'] == False:
-            module.fail_json(msg='Community not set when using snmp version 2')
-
-    if m_args['version'] == "v3":
-        if m_args['username'] == None:
-            module.fail_json(msg='Username not set when using snmp version 3')
-
-        if m_args['level'] == "authPriv" and m_args['privacy'] == None:
-            module.fail_json(msg='Privacy algorithm not set when using authPriv')
-
-
-        if m_args['integrity'] == "sha":
-            integrity_proto = cmdgen.usmHMACSHAAuthProtocol
-        elif m_args['integrity'] == "md5":
-            integrity_proto = cmdgen.usmHMACMD5AuthProtocol
-
-        if m_args['privacy'] == "aes":
-            privacy_proto = cmdgen.usmAesCfb128Protocol
-        elif m_args['privacy'] == "des":
-            privacy_proto = cmdgen.usmDESPrivProtocol
-
-    # Use SNMP Version 2
-    if m_args['version'] == "v2" or m_args['version'] == "v2c":
-        snmp_auth = cmdgen.CommunityData(m_args['community'])
-
-    # Use SNMP Version 3 with authNoPriv
-    elif m_args['level'] == "authNoPriv":
-        snmp_auth = cmdgen.UsmUserData(m_args['username'], authKey=m_args['authkey'], authProtocol=integrity_proto)
-
-    # Use SNMP Version 3 with authPriv
-    else:
-        snmp_auth = cmdgen.UsmUserData(m_args['username'], authKey=m_args['authkey'], privKey=m_args['privkey'], authProtocol=integrity_proto, privProtocol=privacy_proto)
+SYSTEM_OIDS = ['sysDescr', 'sysObjectId', 'sysUpTime', 'sysContact', 'sysName', 'sysLocation']
+
+TABLE_COLUMNS = ['ifIndex', 'ifDescr', 'ifMtu', 'ifSpeed', 'ifPhysAddress',
+                 'ifAdminStatus', 'ifOperStatus', 'ipAdEntAddr', 'ipAdEntIfIndex',
+                 'ipAdEntNetMask', 'ifAlias']
+
+class BulkWalker(object):
+    """Poll hosts with GETBULK walks driven by a single pysnmp dispatcher.
+
+    Every host is first asked for the system group with one GET, its
+    interface columns and any extra subtrees are then walked with GETBULK.
+    All requests share one AsyncCommandGenerator, so up to ``concurrency``
+    hosts are in flight at once and the next host is started from the
+    callback of the one that just finished.
+    """
+
+    def __init__(self, snmp_auth, max_repetitions, extra_oids, concurrency):
+        self.cmdGen = cmdgen.AsyncCommandGenerator()
+        self.snmp_auth = snmp_auth
+        self.max_repetitions = max_repetitions
+        self.concurrency = concurrency
+
+        p = DefineOid(dotprefix=False)
+        self.sys_oids = [getattr(p, name) for name in SYSTEM_OIDS]
+        self.roots = [getattr(p, name) for name in TABLE_COLUMNS]
+        for oid in extra_oids:
+            if oid not in self.roots:
+                self.roots.append(oid)
+
+        self.pending = []
+        self.results = {}
+
+    def run(self, hosts):
+        self.pending = list(reversed(hosts))
+        started = False
+        for i in range(min(self.concurrency, len(hosts))):
+            started = self._start_next() or started
+        if started:
+            self.cmdGen.snmpEngine.transportDispatcher.runDispatcher()
+        return self.results
+
+    def _start_next(self):
+        """Send the first request of the next pending host that resolves.
+        Returns whether a request was sent."""
+        while self.pending:
+            host = self.pending.pop()
+            state = {
+                'host': host,
+                'sys': [],
+                'columns': dict((root, []) for root in self.roots),
+                'active': [True] * len(self.roots),
+            }
+            try:
+                state['target'] = cmdgen.UdpTransportTarget((host, 161))
+            except PySnmpError, e:
+                # an unresolvable name fails this host only, like a timeout
+                self.results[host] = (str(e), state['sys'], state['columns'])
+                continue
+            self.cmdGen.asyncGetCmd(
+                self.snmp_auth,
+                state['target'],
+                [cmdgen.MibVariable('.' + oid,) for oid in self.sys_oids],
+                (self._got_system, state),
+                lookupNames=False,
+                lookupValues=False
+            )
+            return True
+        return False
+
+    def _finish(self, state, error=None):
+        self.results[state['host']] = (error, state['sys'], state['columns'])
+        self._start_next()
+
+    def _got_system(self, sendRequestHandle, errorIndication, errorStatus,
+                    errorIndex, varBinds, state):
+        if errorIndication:
+            self._finish(state, str(errorIndication))
+            return
+        if errorStatus:
+            self._finish(state, errorStatus.prettyPrint())
+            return
 
-    # Use p to prefix OIDs with a dot for polling
-    p = DefineOid(dotprefix=True)
+        for oid, val in varBinds:
+            state['sys'].append((oid.prettyPrint(), val.prettyPrint()))
+
+        self.cmdGen.asyncBulkCmd(
+            self.snmp_auth,
+            state['target'],
+            0,
+            self.max_repetitions,
+            [cmdgen.MibVariable('.' + oid,) for oid in self.roots],
+            (self._got_rows, state),
+            lookupNames=False,
+            lookupValues=False
+        )
+
+    def _got_rows(self, sendRequestHandle, errorIndication, errorStatus,
+                  errorIndex, varBindTable, state):
+        if errorIndication:
+            self._finish(state, str(errorIndication))
+            return False
+        if errorStatus:
+            self._finish(state, errorStatus.prettyPrint())
+            return False
+
+        active = state['active']
+        for varBinds in varBindTable:
+            if not varBinds:
+                continue
+            for column, (oid, val) in enumerate(varBinds):
+                if not active[column]:
+                    continue
+                root = self.roots[column]
+                current_oid = oid.prettyPrint()
+                # A GETBULK response keeps going past the end of a column,
+                # stop collecting it at the first OID outside its subtree.
+                if isinstance(val, EndOfMibView) or not current_oid.startswith(root + '.'):
+                    active[column] = False
+                    continue
+                state['columns'][root].append((current_oid, val.prettyPrint()))
+
+        if True in active:
+            return True
+        self._finish(state)
+        return False
+
+def parse_facts(sys_binds, columns, extra_oids):
     # Use v without a prefix to use with return values
     v = DefineOid(dotprefix=False)
 
@@ -240,25 +355,7 @@ def main():
 
     results = Tree()
 
-    errorIndication, errorStatus, errorIndex, varBinds = cmdGen.getCmd(
-        snmp_auth,
-        cmdgen.UdpTransportTarget((m_args['host'], 161)),
-        cmdgen.MibVariable(p.sysDescr,),
-        cmdgen.MibVariable(p.sysObjectId,),
-        cmdgen.MibVariable(p.sysUpTime,),
-        cmdgen.MibVariable(p.sysContact,),
-        cmdgen.MibVariable(p.sysName,),
-        cmdgen.MibVariable(p.sysLocation,),
-        lookupMib=False
-    )
-
-
-    if errorIndication:
-        module.fail_json(msg=str(errorIndication))
-
-    for oid, val in varBinds:
-        current_oid = oid.prettyPrint()
-        current_val = val.prettyPrint()
+    for current_oid, current_val in sys_binds:
         if current_oid == v.sysDescr:
             results['ansible_sysdescr'] = decode_hex(current_val)
         elif current_oid == v.sysObjectId:
@@ -272,37 +369,13 @@ def main():
         elif current_oid == v.sysLocation:
             results['ansible_syslocation'] = current_val
 
-    errorIndication, errorStatus, errorIndex, varTable = cmdGen.nextCmd(
-        snmp_auth,
-        cmdgen.UdpTransportTarget((m_args['host'], 161)),
-        cmdgen.MibVariable(p.ifIndex,),
-        cmdgen.MibVariable(p.ifDescr,),
-        cmdgen.MibVariable(p.ifMtu,),
-        cmdgen.MibVariable(p.ifSpeed,),
-        cmdgen.MibVariable(p.ifPhysAddress,),
-        cmdgen.MibVariable(p.ifAdminStatus,),
-        cmdgen.MibVariable(p.ifOperStatus,),
-        cmdgen.MibVariable(p.ipAdEntAddr,),
-        cmdgen.MibVariable(p.ipAdEntIfIndex,),
-        cmdgen.MibVariable(p.ipAdEntNetMask,),
-
-        cmdgen.MibVariable(p.ifAlias,),
-        lookupMib=False
-    )
-
-
-    if errorIndication:
-        module.fail_json(msg=str(errorIndication))
-
     interface_indexes = []
 
     all_ipv4_addresses = []
     ipv4_networks = Tree()
 
-    for varBinds in varTable:
-        for oid, val in varBinds:
-            current_oid = oid.prettyPrint()
-            current_val = val.prettyPrint()
+    for column in TABLE_COLUMNS:
+        for current_oid, current_val in columns.get(getattr(v, column), []):
             if v.ifIndex in current_oid:
                 ifIndex = int(current_oid.rsplit('.', 1)[-1])
                 results['ansible_interfaces'][ifIndex]['ifindex'] = current_val
@@ -313,7 +386,7 @@ def main():
             if v.ifMtu in current_oid:
                 ifIndex = int(current_oid.rsplit('.', 1)[-1])
                 results['ansible_interfaces'][ifIndex]['mtu'] = current_val
-            if v.ifMtu in current_oid:
+            if v.ifSpeed in current_oid:
                 ifIndex = int(current_oid.rsplit('.', 1)[-1])
                 results['ansible_interfaces'][ifIndex]['speed'] = current_val
             if v.ifPhysAddress in current_oid:
@@ -361,7 +434,111 @@ def main():
 
     results['ansible_all_ipv4_addresses'] = all_ipv4_addresses
 
-    module.exit_json(ansible_facts=results)
+    if extra_oids:
+        snmp_oids = {}
+        for root in extra_oids:
+            for current_oid, current_val in columns.get(root, []):
+                snmp_oids[current_oid] = current_val
+        results['ansible_snmp_oids'] = snmp_oids
+
+    return results
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            host=dict(required=False),
+            hosts=dict(required=False, type='list'),
+            version=dict(required=True, choices=['v2', 'v2c', 'v3']),
+            community=dict(required=False, default=False),
+            username=dict(required=False),
+            level=dict(required=False, choices=['authNoPriv', 'authPriv']),
+            integrity=dict(required=False, choices=['md5', 'sha']),
+            privacy=dict(required=False, choices=['des', 'aes']),
+            authkey=dict(required=False),
+            privkey=dict(required=False),
+            max_repetitions=dict(required=False, default=25, type='int'),
+            oids=dict(required=False, default=[], type='list'),
+            concurrency=dict(required=False, default=64, type='int'),
+            removeplaceholder=dict(required=False)),
+            required_together = ( ['username','level','integrity','authkey'],['privacy','privkey'],),
+            required_one_of = ( ['host','hosts'],),
+            mutually_exclusive = ( ['host','hosts'],),
+        supports_check_mode=False)
+
+    m_args = module.params
+
+    if not has_pysnmp:
+        module.fail_json(msg='Missing required pysnmp module (check docs)')
+
+    # Verify that we receive a community when using snmp v2
+    if m_args['version'] == "v2" or m_args['version'] == "v2c":
+        if m_args['community'] == False:
+            module.fail_json(msg='Community not set when using snmp version 2')
+
+    if m_args['version'] == "v3":
+        if m_args['username'] == None:
+            module.fail_json(msg='Username not set when using snmp version 3')
+
+        if m_args['level'] == "authPriv" and m_args['privacy'] == None:
+            module.fail_json(msg='Privacy algorithm not set when using authPriv')
+
+
+        if m_args['integrity'] == "sha":
+            integrity_proto = cmdgen.usmHMACSHAAuthProtocol
+        elif m_args['integrity'] == "md5":
+            integrity_proto = cmdgen.usmHMACMD5AuthProtocol
+
+        if m_args['privacy'] == "aes":
+            privacy_proto = cmdgen.usmAesCfb128Protocol
+        elif m_args['privacy'] == "des":
+            privacy_proto = cmdgen.usmDESPrivProtocol
+
+    if m_args['max_repetitions'] < 1:
+        module.fail_json(msg='max_repetitions must be at least 1')
+
+    if m_args['concurrency'] < 1:
+        module.fail_json(msg='concurrency must be at least 1')
+
+    # Use SNMP Version 2
+    if m_args['version'] == "v2" or m_args['version'] == "v2c":
+        snmp_auth = cmdgen.CommunityData(m_args['community'])
+
+    # Use SNMP Version 3 with authNoPriv
+    elif m_args['level'] == "authNoPriv":
+        snmp_auth = cmdgen.UsmUserData(m_args['username'], authKey=m_args['authkey'], authProtocol=integrity_proto)
+
+    # Use SNMP Version 3 with authPriv
+    else:
+        snmp_auth = cmdgen.UsmUserData(m_args['username'], authKey=m_args['authkey'], privKey=m_args['privkey'], authProtocol=integrity_proto, privProtocol=privacy_proto)
+
+    extra_oids = [oid.strip('.') for oid in m_args['oids']]
+
+    if m_args['host']:
+        hosts = [m_args['host']]
+    else:
+        hosts = m_args['hosts']
+
+    walker = BulkWalker(snmp_auth, m_args['max_repetitions'], extra_oids,
+                        m_args['concurrency'])
+    polled = walker.run(hosts)
+
+    if m_args['host']:
+        error, sys_binds, columns = polled[m_args['host']]
+        if error:
+            module.fail_json(msg=error)
+        results = parse_facts(sys_binds, columns, extra_oids)
+        module.exit_json(ansible_facts=results)
+
+    snmp_hosts = {}
+    failed_hosts = {}
+    for host in hosts:
+        error, sys_binds, columns = polled[host]
+        if error:
+            failed_hosts[host] = error
+        else:
+            snmp_hosts[host] = parse_facts(sys_binds, columns, extra_oids)
+
+    module.exit_json(changed=False, snmp_hosts=snmp_hosts, failed_hosts=failed_hosts)
 
 
 main()
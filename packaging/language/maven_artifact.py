@@ -24,7 +24,12 @@ __author__ = 'cschmidt'
 from lxml import etree
 import os
 import hashlib
-import sys
+import httplib
+import shutil
+import tempfile
+import threading
+import time
+import Queue
 
 DOCUMENTATION = '''
 ---
@@ -96,6 +101,37 @@ options:
         default: 'yes'
         choices: ['yes', 'no']
         version_added: "1.9.3"
+    artifacts:
+        description:
+            - A list of artifacts to download concurrently into the I(dest) directory, given as
+              C(group_id:artifact_id:version), C(group_id:artifact_id:extension:version) or
+              C(group_id:artifact_id:extension:classifier:version) coordinates.
+            - When set, I(group_id), I(artifact_id), I(version), I(classifier) and I(extension) are ignored.
+        required: false
+        default: null
+        version_added: "2.1"
+    workers:
+        description:
+            - Number of artifacts resolved and downloaded at the same time when I(artifacts) is used.
+        required: false
+        default: 4
+        version_added: "2.1"
+    cache_dir:
+        description:
+            - A directory on the target host where downloaded artifacts are kept, laid out like a Maven
+              repository. A cached artifact whose recorded sha1 still matches its content is copied to
+              I(dest) without contacting the repository again.
+            - Resolved C(maven-metadata.xml) documents are also kept here for I(metadata_ttl) seconds.
+        required: false
+        default: null
+        version_added: "2.1"
+    metadata_ttl:
+        description:
+            - Number of seconds a cached C(maven-metadata.xml) is used to resolve C(latest) and SNAPSHOT
+              versions before it is downloaded again. C(0) disables metadata caching.
+        required: false
+        default: 300
+        version_added: "2.1"
 '''
 
 EXAMPLES = '''
@@ -110,6 +146,16 @@ EXAMPLES = '''
 
 # Download a WAR File to the Tomcat webapps directory to be deployed
 - maven_artifact: group_id=com.company artifact_id=web-app extension=war repository_url=https://repo.company.com/maven dest=/var/lib/tomcat7/webapps/web-app.war
+
+# Download several services at once, reusing the artifacts already cached on the host
+- maven_artifact:
+    artifacts:
+      - com.company:billing:2.3.1
+      - com.company:gateway:war:1.4.0
+      - com.company:reports:jar:all:0.9-SNAPSHOT
+    repository_url: https://repo.company.com/maven
+    cache_dir: /var/cache/maven-artifacts
+    dest: /opt/services
 '''
 
 class Artifact(object):
@@ -179,17 +225,131 @@ class Artifact(object):
             return None
 
 
+# Read and hash downloads in 1 MiB blocks, and retry an interrupted
+# download this many times, resuming with a Range request each time.
+BUFFER_SIZE = 1024 * 1024
+DOWNLOAD_RETRIES = 3
+
+
+class ArtifactCache(object):
+    """ A local directory of downloaded artifacts shared by every run on the host.
+
+    Artifacts are stored at their repository path, with the sha1 of the
+    content recorded in a .sha1 file next to them once it has been checked
+    against the repository. Resolved maven-metadata.xml documents are kept
+    under metadata/ and reused for metadata_ttl seconds. """
+
+    def __init__(self, root, metadata_ttl=300):
+        self.root = root
+        self.metadata_ttl = metadata_ttl
+
+    def artifact_path(self, artifact, url):
+        return os.path.join(self.root, artifact.path(), url.rsplit("/", 1)[-1])
+
+    def metadata_path(self, url):
+        return os.path.join(self.root, "metadata", hashlib.sha1(url).hexdigest() + ".xml")
+
+    def lookup(self, path):
+        if not os.path.isfile(path) or not os.path.isfile(path + ".sha1"):
+            return False
+        with open(path + ".sha1") as f:
+            recorded = f.read().strip()
+        return local_checksum(path, hashlib.sha1) == recorded
+
+    def store(self, part, path, sha1):
+        os.rename(part, path)
+        _write_atomic(path + ".sha1", sha1)
+
+    def load_metadata(self, url):
+        if self.metadata_ttl <= 0:
+            return None
+        path = self.metadata_path(url)
+        try:
+            if time.time() - os.path.getmtime(path) >= self.metadata_ttl:
+                return None
+            return etree.parse(path)
+        except (OSError, IOError, etree.XMLSyntaxError):
+            return None
+
+    def store_metadata(self, url, xml):
+        if self.metadata_ttl <= 0:
+            return
+        path = self.metadata_path(url)
+        _makedirs(os.path.dirname(path))
+        _write_atomic(path, etree.tostring(xml))
+
+
+def _makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.rename(tmp_path, path)
+
+
+def _copy_atomic(src, dest):
+    part = dest + ".part"
+    shutil.copyfile(src, part)
+    os.rename(part, dest)
+
+
+def _hash_file(file, *digests):
+    size = 0
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(BUFFER_SIZE), ''):
+            size += len(chunk)
+            for digest in digests:
+                digest.update(chunk)
+    return size
+
+
+def local_checksum(file, algorithm=hashlib.md5):
+    digest = algorithm()
+    _hash_file(file, digest)
+    return digest.hexdigest()
+
+
 class MavenDownloader:
-    def __init__(self, module, base="http://repo1.maven.org/maven2"):
+    def __init__(self, module, base="http://repo1.maven.org/maven2", cache=None):
         self.module = module
         if base.endswith("/"):
             base = base.rstrip("/")
         self.base = base
         self.user_agent = "Maven Artifact Downloader/1.0"
+        self.cache = cache
+        self._metadata = {}
+        self._metadata_lock = threading.Lock()
+
+    def _get_metadata(self, path):
+        url = self.base + path
+        self._metadata_lock.acquire()
+        try:
+            xml = self._metadata.get(url)
+        finally:
+            self._metadata_lock.release()
+        if xml is None and self.cache:
+            xml = self.cache.load_metadata(url)
+        if xml is None:
+            xml = self._request(url, "Failed to download maven-metadata.xml", lambda r: etree.parse(r))
+            if self.cache:
+                self.cache.store_metadata(url, xml)
+        self._metadata_lock.acquire()
+        try:
+            self._metadata[url] = xml
+        finally:
+            self._metadata_lock.release()
+        return xml
 
     def _find_latest_version_available(self, artifact):
         path = "/%s/maven-metadata.xml" % (artifact.path(False))
-        xml = self._request(self.base + path, "Failed to download maven-metadata.xml", lambda r: etree.parse(r))
+        xml = self._get_metadata(path)
         v = xml.xpath("/metadata/versioning/versions/version[last()]/text()")
         if v:
             return v[0]
@@ -197,7 +357,7 @@ class MavenDownloader:
     def find_uri_for_artifact(self, artifact):
         if artifact.is_snapshot():
             path = "/%s/maven-metadata.xml" % (artifact.path())
-            xml = self._request(self.base + path, "Failed to download maven-metadata.xml", lambda r: etree.parse(r))
+            xml = self._get_metadata(path)
             timestamp = xml.xpath("/metadata/versioning/snapshot/timestamp/text()")[0]
             buildNumber = xml.xpath("/metadata/versioning/snapshot/buildNumber/text()")[0]
             return self._uri_for_artifact(artifact, artifact.version.replace("SNAPSHOT", timestamp + "-" + buildNumber))
@@ -215,63 +375,139 @@ class MavenDownloader:
         return self.base + "/" + artifact.path() + "/" + artifact.artifact_id + "-" + version + "." + artifact.extension
 
     def _request(self, url, failmsg, f):
+        response, info = self._open(url, failmsg)
+        return f(response)
+
+    def _open(self, url, failmsg, headers=None, statuses=(200,)):
         # Hack to add parameters in the way that fetch_url expects
         self.module.params['url_username'] = self.module.params.get('username', '')
         self.module.params['url_password'] = self.module.params.get('password', '')
         self.module.params['http_agent'] = self.module.params.get('user_agent', None)
 
-        response, info = fetch_url(self.module, url)
-        if info['status'] != 200:
+        response, info = fetch_url(self.module, url, headers=headers)
+        if info['status'] not in statuses:
             raise ValueError(failmsg + " because of " + info['msg'] + "for URL " + url)
-        else:
-            return f(response)
-
+        return response, info
 
-    def download(self, artifact, filename=None):
-        filename = artifact.get_filename(filename)
+    def resolve(self, artifact):
         if not artifact.version or artifact.version == "latest":
             artifact = Artifact(artifact.group_id, artifact.artifact_id, self._find_latest_version_available(artifact),
                                 artifact.classifier, artifact.extension)
+        return artifact
+
+    def download(self, artifact, filename=None):
+        filename = artifact.get_filename(filename)
+        artifact = self.resolve(artifact)
 
         url = self.find_uri_for_artifact(artifact)
+        if self.cache:
+            return self._download_cached(artifact, url, filename)
         if not self.verify_md5(filename, url + ".md5"):
-            response = self._request(url, "Failed to download artifact " + str(artifact), lambda r: r)
-            if response:
-                with open(filename, 'w') as f:
-                    # f.write(response.read())
-                    self._write_chunks(response, f, report_hook=self.chunk_report)
-                return True
-            else:
-                return False
-        else:
-            return True
-
-    def chunk_report(self, bytes_so_far, chunk_size, total_size):
-        percent = float(bytes_so_far) / total_size
-        percent = round(percent * 100, 2)
-        sys.stdout.write("Downloaded %d of %d bytes (%0.2f%%)\r" %
-                         (bytes_so_far, total_size, percent))
-
-        if bytes_so_far >= total_size:
-            sys.stdout.write('\n')
-
-    def _write_chunks(self, response, file, chunk_size=8192, report_hook=None):
-        total_size = response.info().getheader('Content-Length').strip()
-        total_size = int(total_size)
-        bytes_so_far = 0
-
-        while 1:
-            chunk = response.read(chunk_size)
-            bytes_so_far += len(chunk)
-
-            if not chunk:
+            part = filename + ".part"
+            self._download_verified(artifact, url, part)
+            os.rename(part, filename)
+        return True
+
+    def _download_cached(self, artifact, url, filename):
+        cached = self.cache.artifact_path(artifact, url)
+        if not self.cache.lookup(cached):
+            _makedirs(os.path.dirname(cached))
+            part = cached + ".part"
+            md5, sha1 = self._download_verified(artifact, url, part)
+            self.cache.store(part, cached, sha1)
+        _copy_atomic(cached, filename)
+        return True
+
+    def download_file(self, url, part, failmsg):
+        """ Stream url into the file part and return its md5 and sha1.
+
+        Both digests are computed while the data is written. Bytes already
+        in part, from an earlier attempt or an earlier run, are kept and
+        only the rest is requested with a Range header. A dropped
+        connection is resumed the same way up to DOWNLOAD_RETRIES times. """
+        md5 = hashlib.md5()
+        sha1 = hashlib.sha1()
+        offset = 0
+        if os.path.exists(part):
+            offset = _hash_file(part, md5, sha1)
+
+        attempt = 0
+        while True:
+            headers = {}
+            if offset:
+                headers['Range'] = 'bytes=%d-' % offset
+            try:
+                response, info = self._open(url, failmsg, headers=headers, statuses=(-1, 200, 206, 416))
+                if info['status'] == -1:
+                    raise IOError(info['msg'])
+                if info['status'] == 416:
+                    # Nothing left past offset, part is already complete
+                    break
+                if info['status'] == 200 and offset:
+                    # The server ignored the Range header and sent everything
+                    md5 = hashlib.md5()
+                    sha1 = hashlib.sha1()
+                    offset = 0
+
+                expected = None
+                if response.info().getheader('Content-Length'):
+                    expected = offset + int(response.info().getheader('Content-Length').strip())
+
+                with open(part, offset and 'ab' or 'wb') as f:
+                    while True:
+                        chunk = response.read(BUFFER_SIZE)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        md5.update(chunk)
+                        sha1.update(chunk)
+                        offset += len(chunk)
+
+                if expected is not None and offset < expected:
+                    raise IOError("connection closed after %d of %d bytes" % (offset, expected))
                 break
+            except (IOError, httplib.HTTPException), e:
+                attempt += 1
+                if attempt > DOWNLOAD_RETRIES:
+                    raise ValueError(failmsg + " after %d attempts: %s" % (attempt, e))
+
+        return md5.hexdigest(), sha1.hexdigest()
+
+    def _download_verified(self, artifact, url, part):
+        """ Download url into part and check it against the remote checksum.
+
+        A part left by an earlier run may belong to another version or
+        another artifact with the same dest, so when a resumed download
+        fails verification it is fetched once more from the first byte.
+        Returns the md5 and sha1 of the verified part. """
+        failmsg = "Failed to download artifact " + str(artifact)
+        resumed = os.path.exists(part)
+        md5, sha1 = self.download_file(url, part, failmsg)
+        try:
+            self._verify(artifact, url, part, md5, sha1)
+        except ValueError:
+            # _verify only removes part on a checksum mismatch
+            if not resumed or os.path.exists(part):
+                raise
+            md5, sha1 = self.download_file(url, part, failmsg)
+            self._verify(artifact, url, part, md5, sha1)
+        return md5, sha1
+
+    def _verify(self, artifact, url, part, md5, sha1):
+        algorithm, remote = self._remote_checksum(url)
+        if algorithm == "sha1":
+            local = sha1
+        else:
+            local = md5
+        if local != remote:
+            os.remove(part)
+            raise ValueError("Checksum mismatch for artifact " + str(artifact) + " downloaded from " + url)
 
-            file.write(chunk)
-            if report_hook:
-                report_hook(bytes_so_far, chunk_size, total_size)
-
-        return bytes_so_far
+    def _remote_checksum(self, url):
+        try:
+            return "sha1", self._request(url + ".sha1", "Failed to download SHA1", lambda r: r.read().split()[0])
+        except ValueError:
+            return "md5", self._request(url + ".md5", "Failed to download MD5", lambda r: r.read().split()[0])
 
     def verify_md5(self, file, remote_md5):
         if not os.path.exists(file):
@@ -282,11 +518,64 @@ class MavenDownloader:
             return local_md5 == remote
 
     def _local_md5(self, file):
-        md5 = hashlib.md5()
-        with open(file, 'rb') as f:
-            for chunk in iter(lambda: f.read(8192), ''):
-                md5.update(chunk)
-        return md5.hexdigest()
+        return local_checksum(file, hashlib.md5)
+
+
+def ensure_artifact(downloader, artifact, dest):
+    """ Download artifact to dest unless it is already there.
+
+    Returns True when dest was written. """
+    if os.path.isdir(dest):
+        dest = dest + "/" + artifact.artifact_id + "-" + artifact.version + "." + artifact.extension
+    if os.path.lexists(dest):
+        if not artifact.is_snapshot():
+            return dest, False
+        elif downloader.verify_md5(dest, downloader.find_uri_for_artifact(artifact) + '.md5'):
+            return dest, False
+    else:
+        path = os.path.dirname(dest)
+        if not os.path.exists(path):
+            _makedirs(path)
+
+    if not downloader.download(artifact, dest):
+        raise ValueError("Unable to download the artifact " + str(artifact))
+    return dest, True
+
+
+def ensure_artifacts(downloader, artifacts, dest, workers):
+    """ Download a list of artifacts into the dest directory with a pool of
+    worker threads. Returns one result dict per artifact, in order. """
+    tasks = Queue.Queue()
+    results = [None] * len(artifacts)
+
+    def worker():
+        while True:
+            try:
+                index = tasks.get_nowait()
+            except Queue.Empty:
+                return
+            artifact = artifacts[index]
+            result = dict(artifact=str(artifact), changed=False)
+            try:
+                result['dest'], result['changed'] = ensure_artifact(downloader, artifact, dest)
+            except Exception as e:
+                result['failed'] = True
+                result['msg'] = str(e)
+            results[index] = result
+
+    for index in range(len(artifacts)):
+        tasks.put(index)
+
+    threads = []
+    for i in range(min(workers, len(artifacts))):
+        thread = threading.Thread(target=worker)
+        thread.setDaemon(True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+    return results
 
 
 def main():
@@ -303,6 +592,10 @@ def main():
             state = dict(default="present", choices=["present","absent"]), # TODO - Implement a "latest" state
             dest = dict(type="path", default=None),
             validate_certs = dict(required=False, default=True, type='bool'),
+            artifacts = dict(required=False, default=None, type='list'),
+            workers = dict(required=False, default=4, type='int'),
+            cache_dir = dict(required=False, default=None, type='path'),
+            metadata_ttl = dict(required=False, default=300, type='int'),
         )
     )
 
@@ -316,42 +609,62 @@ def main():
     repository_password = module.params["password"]
     state = module.params["state"]
     dest = module.params["dest"]
+    artifacts = module.params["artifacts"]
+    cache_dir = module.params["cache_dir"]
 
     if not repository_url:
         repository_url = "http://repo1.maven.org/maven2"
 
+    cache = None
+    if cache_dir:
+        cache = ArtifactCache(cache_dir, module.params["metadata_ttl"])
+
     #downloader = MavenDownloader(module, repository_url, repository_username, repository_password)
-    downloader = MavenDownloader(module, repository_url)
+    downloader = MavenDownloader(module, repository_url, cache=cache)
+
+    if artifacts:
+        if not dest:
+            module.fail_json(msg="dest is required when artifacts is used")
+        if module.params["workers"] < 1:
+            module.fail_json(msg="workers must be at least 1")
+        if os.path.exists(dest) and not os.path.isdir(dest):
+            module.fail_json(msg="dest must be a directory when artifacts is used")
+        if not os.path.exists(dest):
+            os.makedirs(dest)
+
+        parsed = []
+        for coordinates in artifacts:
+            try:
+                artifact = Artifact.parse(coordinates)
+            except ValueError as e:
+                module.fail_json(msg=e.args[0])
+            if artifact is None:
+                module.fail_json(msg="Invalid artifact coordinates: %s" % coordinates)
+            parsed.append(artifact)
+
+        results = ensure_artifacts(downloader, parsed, dest, module.params["workers"])
+        changed = True in [result['changed'] for result in results]
+        failed = [result for result in results if result.get('failed')]
+        if failed:
+            module.fail_json(msg="Unable to download %d of %d artifacts" % (len(failed), len(results)),
+                             results=results, changed=changed)
+        module.exit_json(state=state, dest=dest, results=results, repository_url=repository_url, changed=changed)
 
     try:
         artifact = Artifact(group_id, artifact_id, version, classifier, extension)
     except ValueError as e:
         module.fail_json(msg=e.args[0])
 
-    prev_state = "absent"
-    if os.path.isdir(dest):
-        dest = dest + "/" + artifact_id + "-" + version + "." + extension
-    if os.path.lexists(dest):
-        if not artifact.is_snapshot():
-            prev_state = "present"
-        elif downloader.verify_md5(dest, downloader.find_uri_for_artifact(artifact) + '.md5'):
-            prev_state = "present"
-    else:
-        path = os.path.dirname(dest)
-        if not os.path.exists(path):
-            os.makedirs(path)
-
-    if prev_state == "present":
-        module.exit_json(dest=dest, state=state, changed=False)
-
     try:
-        if downloader.download(artifact, dest):
-            module.exit_json(state=state, dest=dest, group_id=group_id, artifact_id=artifact_id, version=version, classifier=classifier, extension=extension, repository_url=repository_url, changed=True)
-        else:
-            module.fail_json(msg="Unable to download the artifact")
+        dest, changed = ensure_artifact(downloader, artifact, dest)
     except ValueError as e:
         module.fail_json(msg=e.args[0])
 
+    if not changed:
+        module.exit_json(dest=dest, state=state, changed=False)
+
+    module.exit_json(state=state, dest=dest, group_id=group_id, artifact_id=artifact_id, version=version, classifier=classifier, extension=extension, repository_url=repository_url, changed=True)
+
 
 # import module snippets
 from ansible.module_utils.basic import *
@@ -89,6 +89,8 @@ EXAMPLES = '''
 import os
 import re
 
+APK_INSTALLED_DB = '/lib/apk/db/installed'
+
 def update_package_db(module):
     cmd = "%s update" % (APK_PATH)
     rc, stdout, stderr = module.run_command(cmd, check_rc=False)
@@ -97,22 +99,88 @@ def update_package_db(module):
     else:
         module.fail_json(msg="could not update package db")
 
-def query_package(module, name):
-    cmd = "%s -v info --installed %s" % (APK_PATH, name)
+def parse_installed_db(content):
+    """Take the content of the installed database and return a dict of
+    package name to version"""
+    installed = {}
+    name = version = None
+    for line in content.split('\n'):
+        if not line.strip():
+            if name:
+                installed[name] = version
+            name = version = None
+        elif line.startswith('P:'):
+            name = line[2:].strip()
+        elif line.startswith('V:'):
+            version = line[2:].strip()
+    if name:
+        installed[name] = version
+    return installed
+
+def split_package_version(package):
+    """Split name-version-rN as printed by apk into name and version"""
+    match = re.match(r'^(.+)-([^-]+-r\d+)$', package)
+    if match:
+        return match.group(1), match.group(2)
+    return package, None
+
+def read_installed(module):
+    """Return a dict of installed package name to version, read in one pass
+    from the installed database, or from a single `apk info -v` when the
+    database cannot be read"""
+    try:
+        f = open(APK_INSTALLED_DB)
+        try:
+            return parse_installed_db(f.read())
+        finally:
+            f.close()
+    except IOError:
+        pass
+
+    cmd = "%s info -v" % (APK_PATH)
     rc, stdout, stderr = module.run_command(cmd, check_rc=False)
-    if rc == 0:
-        return True
-    else:
-        return False
+    if rc != 0:
+        module.fail_json(msg="could not list installed packages")
+    installed = {}
+    for line in stdout.split('\n'):
+        if line.strip():
+            name, version = split_package_version(line.strip())
+            installed[name] = version
+    return installed
+
+def split_constraint(name):
+    """Split a name like foo=1.2-r0 or foo>1.2 into the package name and
+    the constraint, which is empty when the name has none"""
+    match = re.match(r'^([^=<>~]+)(.*)$', name)
+    if match:
+        return match.group(1), match.group(2)
+    return name, ''
 
-def query_latest(module, name):
-    cmd = "%s version %s" % (APK_PATH, name)
+def package_installed(module, installed, name):
+    """Whether name is satisfied by the installed packages. Names missing
+    from the database, such as so: or cmd: provides, are asked to apk"""
+    base, constraint = split_constraint(name)
+    if base in installed:
+        if constraint.startswith('=') and not constraint.startswith('=~'):
+            return installed[base] == constraint.lstrip('=')
+        return True
+    cmd = "%s -v info --installed %s" % (APK_PATH, base)
     rc, stdout, stderr = module.run_command(cmd, check_rc=False)
-    search_pattern = "(%s)-[\d\.\w]+-[\d\w]+\s+(.)\s+[\d\.\w]+-[\d\w]+\s+" % (name)
-    match = re.search(search_pattern, stdout)
-    if match and match.group(2) == "<":
-        return False
-    return True
+    return rc == 0
+
+def read_upgradable(module):
+    """Return the set of installed packages that have a newer version
+    available, from a single `apk version -l '<'`"""
+    rc, stdout, stderr = module.run_command([APK_PATH, 'version', '-l', '<'], check_rc=False)
+    if rc != 0:
+        module.fail_json(msg="could not list upgradable packages")
+    upgradable = set()
+    for line in stdout.split('\n'):
+        fields = line.split()
+        if len(fields) >= 2 and fields[1] == '<':
+            name, version = split_package_version(fields[0])
+            upgradable.add(name)
+    return upgradable
 
 def upgrade_packages(module):
     if module.check_mode:
@@ -127,12 +195,18 @@ def upgrade_packages(module):
     module.exit_json(changed=True, msg="upgraded packages")
 
 def install_packages(module, names, state):
+    installed = read_installed(module)
+    if state == 'latest':
+        upgradable = read_upgradable(module)
+    else:
+        upgradable = set()
     upgrade = False
     uninstalled = []
     for name in names:
-        if not query_package(module, name):
+        if not package_installed(module, installed, name):
+            uninstalled.append(name)
+        elif split_constraint(name)[0] in upgradable:
             uninstalled.append(name)
-        elif state == 'latest' and not query_latest(module, name):
             upgrade = True
     if not uninstalled and not upgrade:
         module.exit_json(changed=False, msg="package(s) already installed")
@@ -153,9 +227,10 @@ def install_packages(module, names, state):
     module.exit_json(changed=True, msg="installed %s package(s)" % (names))
 
 def remove_packages(module, names):
+    db = read_installed(module)
     installed = []
     for name in names:
-        if query_package(module, name):
+        if package_installed(module, db, name):
             installed.append(name)
     if not installed:
         module.exit_json(changed=False, msg="package(s) already removed")
@@ -82,7 +82,44 @@ options:
     choices: ["yes", "no"]
     aliases: []
 
-notes: []
+  metadata_expire:
+    description:
+      - Age in seconds after which the cached repository metadata is
+        downloaded again, overriding the value from the dnf configuration.
+        Use C(-1) to never expire the cache.
+    required: false
+    default: null
+    version_added: "2.1"
+
+  cacheonly:
+    description:
+      - Answer the request from the on-disk metadata cache only, without
+        checking the repositories for newer metadata.
+    required: false
+    default: "no"
+    choices: ["yes", "no"]
+    version_added: "2.1"
+
+  list_filter:
+    description:
+      - Shell-style glob restricting the package names returned by
+        C(list=installed), C(list=updates) and C(list=available).
+    required: false
+    default: null
+    version_added: "2.1"
+
+  list_fields:
+    description:
+      - Keys of each package returned by C(list), for example C(name,nevra).
+        All the keys are returned when not set.
+    required: false
+    default: null
+    version_added: "2.1"
+
+notes:
+  - Requests that only need the installed packages (removals, C(list=installed)
+    and C(state=present) for packages that are already installed) load the
+    system repository only and never read the repository metadata.
 # informational: requirements for nodes
 requirements:
   - "python >= 2.6"
@@ -114,6 +151,12 @@ EXAMPLES = '''
 - name: install the 'Development tools' package group
   dnf: name="@Development tools" state=present
 
+- name: install httpd using repository metadata up to a day old
+  dnf: name=httpd state=present metadata_expire=86400
+
+- name: list the names of the available python packages
+  dnf: list=available list_filter=python* list_fields=name,nevra
+
 '''
 import os
 
@@ -158,6 +201,16 @@ def _configure_base(module, base, conf_file, disable_gpg_check):
     conf.read()
 
 
+def _configure_cache(base, metadata_expire, cacheonly):
+    """Set how long the on-disk repository metadata stays valid."""
+    if metadata_expire is not None:
+        base.conf.metadata_expire = metadata_expire
+
+    if cacheonly:
+        for repo in base.repos.iter_enabled():
+            repo.md_only_cached = True
+
+
 def _specify_repositories(base, disablerepo, enablerepo):
     """Enable and disable repositories matching the provided patterns."""
     base.read_all_repos()
@@ -174,17 +227,47 @@ def _specify_repositories(base, disablerepo, enablerepo):
             repo.enable()
 
 
-def _base(module, conf_file, disable_gpg_check, disablerepo, enablerepo):
-    """Return a fully configured dnf Base object."""
+def _base(module, conf_file, disable_gpg_check, disablerepo, enablerepo,
+          metadata_expire=None, cacheonly=False, load_available_repos=True):
+    """Return a fully configured dnf Base object.
+
+    With load_available_repos=False only the installed packages are loaded
+    in the sack, which skips reading the repository metadata entirely.
+    """
     _fail_if_no_dnf(module)
     base = dnf.Base()
     _configure_base(module, base, conf_file, disable_gpg_check)
     _specify_repositories(base, disablerepo, enablerepo)
-    base.fill_sack()
+    _configure_cache(base, metadata_expire, cacheonly)
+    base.fill_sack(load_system_repo=True,
+                   load_available_repos=load_available_repos)
     return base
 
 
-def _package_dict(package):
+def _is_local_request(state, names):
+    """Whether the request can be answered from the installed packages."""
+    if names == ['*']:
+        return False
+
+    pkg_specs, group_specs, filenames = cli.commands.parse_spec_group_file(
+        names)
+    # Groups and files need the comps data or the rpm headers.
+    if group_specs or filenames:
+        return False
+
+    return state in ['absent', 'removed', 'installed', 'present']
+
+
+def _all_installed(base, names):
+    """Whether every package spec is matched by an installed package."""
+    for name in names:
+        installed = subject.Subject(name).get_best_query(base.sack).installed()
+        if not installed.run():
+            return False
+    return True
+
+
+def _package_dict(package, fields=None):
     """Return a dictionary of information for the package."""
     # NOTE: This no longer contains the 'dnfstate' field because it is
     # already known based on the query type.
@@ -198,10 +281,13 @@ def _package_dict(package):
     result['nevra'] = '{epoch}:{name}-{version}-{release}.{arch}'.format(
         **result)
 
+    if fields:
+        result = dict((key, result[key]) for key in fields if key in result)
+
     return result
 
 
-def list_items(module, base, command):
+def list_items(module, base, command, list_filter=None, fields=None):
     """List package info based on the command."""
     # Rename updates to upgrades
     if command == 'updates':
@@ -209,9 +295,10 @@ def list_items(module, base, command):
 
     # Return the corresponding packages
     if command in ['installed', 'upgrades', 'available']:
-        results = [
-            _package_dict(package)
-            for package in getattr(base.sack.query(), command)()]
+        packages = getattr(base.sack.query(), command)()
+        if list_filter:
+            packages = packages.filter(name__glob=list_filter)
+        results = [_package_dict(package, fields) for package in packages]
     # Return the enabled repository ids
     elif command in ['repos', 'repositories']:
         results = [
@@ -220,7 +307,7 @@ def list_items(module, base, command):
     # Return any matching packages
     else:
         packages = subject.Subject(command).get_best_query(base.sack)
-        results = [_package_dict(package) for package in packages]
+        results = [_package_dict(package, fields) for package in packages]
 
     module.exit_json(results=results)
 
@@ -322,6 +409,10 @@ def main():
             list=dict(),
             conf_file=dict(default=None),
             disable_gpg_check=dict(default=False, type='bool'),
+            metadata_expire=dict(default=None, type='int'),
+            cacheonly=dict(default=False, type='bool'),
+            list_filter=dict(default=None),
+            list_fields=dict(default=None, type='list'),
         ),
         required_one_of=[['name', 'list']],
         mutually_exclusive=[['name', 'list']],
@@ -330,16 +421,28 @@ def main():
     if params['list']:
         base = _base(
             module, params['conf_file'], params['disable_gpg_check'],
-            params['disablerepo'], params['enablerepo'])
-        list_items(module, base, params['list'])
+            params['disablerepo'], params['enablerepo'],
+            params['metadata_expire'], params['cacheonly'],
+            load_available_repos=params['list'] != 'installed')
+        list_items(module, base, params['list'], params['list_filter'],
+                   params['list_fields'])
     else:
         # Note: base takes a long time to run so we want to check for failure
         # before running it.
         if not util.am_i_root():
             module.fail_json(msg="This command has to be run under the root user.")
+        local = _is_local_request(params['state'], params['name'])
         base = _base(
             module, params['conf_file'], params['disable_gpg_check'],
-            params['disablerepo'], params['enablerepo'])
+            params['disablerepo'], params['enablerepo'],
+            params['metadata_expire'], params['cacheonly'],
+            load_available_repos=not local)
+
+        if local and params['state'] in ['installed', 'present']:
+            if _all_installed(base, params['name']):
+                module.exit_json(msg="Nothing to do")
+            # Something is missing, load the repositories to install it.
+            base.fill_sack(load_system_repo=True, load_available_repos=True)
 
         ensure(module, base, params['state'], params['name'])
 
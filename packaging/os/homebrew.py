@@ -92,6 +92,10 @@ EXAMPLES = '''
 - homebrew: name=foo state=present install_options=with-baz,enable-debug
 '''
 
+try:
+    import json
+except ImportError:
+    import simplejson as json
 import os.path
 import re
 
@@ -340,6 +344,8 @@ class Homebrew(object):
         self.changed_count = 0
         self.unchanged_count = 0
         self.message = ''
+        self._installed_index = None
+        self._outdated_index = None
 
     def _setup_instance_vars(self, **kwargs):
         for key, val in kwargs.iteritems():
@@ -387,6 +393,64 @@ class Homebrew(object):
 
         return (failed, changed, message)
 
+    # inventory ---------------------------------------------------- {{{
+    def _installed_formulae(self):
+        '''Index of installed formulae by name, full name and alias, built
+        from a single `brew info --json=v1 --installed` and kept until the
+        next change. False if this brew cannot produce the JSON.'''
+        if self._installed_index is None:
+            formulae = self._brew_json(['info', '--json=v1', '--installed'])
+            if formulae is None:
+                self._installed_index = False
+            else:
+                index = dict()
+                for formula in formulae:
+                    if not formula.get('installed'):
+                        continue
+                    names = [formula.get('name'), formula.get('full_name')]
+                    names.extend(formula.get('aliases') or [])
+                    for name in names:
+                        if name:
+                            index[name] = formula
+                self._installed_index = index
+
+        return self._installed_index
+
+    def _outdated_formulae(self):
+        '''Names of outdated formulae from a single `brew outdated
+        --json=v1`, kept until the next change. False if this brew cannot
+        produce the JSON.'''
+        if self._outdated_index is None:
+            formulae = self._brew_json(['outdated', '--json=v1'])
+            if formulae is None:
+                self._outdated_index = False
+            else:
+                self._outdated_index = set(
+                    formula['name'] for formula in formulae
+                    if formula.get('name')
+                )
+
+        return self._outdated_index
+
+    def _brew_json(self, args):
+        # `brew outdated` exits non-zero when something is outdated, so the
+        # output is trusted whenever it parses
+        rc, out, err = self.module.run_command([self.brew_path] + args)
+        try:
+            return json.loads(out)
+        except ValueError:
+            return None
+
+    def _invalidate_inventory(self):
+        self._installed_index = None
+        self._outdated_index = None
+
+    def _indexed_formula(self, installed):
+        '''The installed formula entry for the current package, or None if
+        the index has no entry under that name.'''
+        return installed.get(self.current_package)
+    # /inventory --------------------------------------------------- }}}
+
     # checks ------------------------------------------------------- {{{
     def _current_package_is_installed(self):
         if not self.valid_package(self.current_package):
@@ -394,6 +458,13 @@ class Homebrew(object):
             self.message = 'Invalid package: {0}.'.format(self.current_package)
             raise HomebrewException(self.message)
 
+        installed = self._installed_formulae()
+        if installed is not False and (
+            self._indexed_formula(installed) is not None
+            or not self._may_be_alias()
+        ):
+            return self._indexed_formula(installed) is not None
+
         cmd = [
             "{brew_path}".format(brew_path=self.brew_path),
             "info",
@@ -409,10 +480,26 @@ class Homebrew(object):
 
         return False
 
+    def _may_be_alias(self):
+        # brew releases before aliases were added to the JSON output can only
+        # resolve an alias through a plain `brew info`
+        installed = self._installed_formulae()
+        return not any('aliases' in formula for formula in installed.values())
+
     def _current_package_is_outdated(self):
         if not self.valid_package(self.current_package):
             return False
 
+        outdated = self._outdated_formulae()
+        installed = self._installed_formulae()
+        if outdated is not False and installed:
+            formula = self._indexed_formula(installed)
+            if formula is not None:
+                return (
+                    formula.get('name') in outdated
+                    or formula.get('full_name') in outdated
+                )
+
         rc, out, err = self.module.run_command([
             self.brew_path,
             'outdated',
@@ -427,6 +514,15 @@ class Homebrew(object):
         elif not self._current_package_is_installed():
             return False
 
+        installed = self._installed_formulae()
+        if installed:
+            formula = self._indexed_formula(installed)
+            if formula is not None:
+                return any(
+                    str(keg.get('version', '')).startswith('HEAD')
+                    for keg in formula.get('installed', [])
+                )
+
         rc, out, err = self.module.run_command([
             self.brew_path,
             'info',
@@ -469,6 +565,7 @@ class Homebrew(object):
             self.brew_path,
             'update',
         ])
+        self._invalidate_inventory()
         if rc == 0:
             if out and isinstance(out, basestring):
                 already_updated = any(
@@ -495,6 +592,7 @@ class Homebrew(object):
             self.brew_path,
             'upgrade',
         ])
+        self._invalidate_inventory()
         if rc == 0:
             if not out:
                 self.message = 'Homebrew packages already upgraded.'
@@ -543,6 +641,7 @@ class Homebrew(object):
         )
         cmd = [opt for opt in opts if opt]
         rc, out, err = self.module.run_command(cmd)
+        self._invalidate_inventory()
 
         if self._current_package_is_installed():
             self.changed_count += 1
@@ -595,6 +694,7 @@ class Homebrew(object):
         )
         cmd = [opt for opt in opts if opt]
         rc, out, err = self.module.run_command(cmd)
+        self._invalidate_inventory()
 
         if self._current_package_is_installed() and not self._current_package_is_outdated():
             self.changed_count += 1
@@ -613,6 +713,7 @@ class Homebrew(object):
         )
         cmd = [opt for opt in opts if opt]
         rc, out, err = self.module.run_command(cmd)
+        self._invalidate_inventory()
 
         if rc == 0:
             self.changed = True
@@ -661,6 +762,7 @@ class Homebrew(object):
         )
         cmd = [opt for opt in opts if opt]
         rc, out, err = self.module.run_command(cmd)
+        self._invalidate_inventory()
 
         if not self._current_package_is_installed():
             self.changed_count += 1
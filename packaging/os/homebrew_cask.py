@@ -265,6 +265,7 @@ class HomebrewCask(object):
         self.changed_count = 0
         self.unchanged_count = 0
         self.message = ''
+        self._installed_casks = None
 
     def _setup_instance_vars(self, **kwargs):
         for key, val in kwargs.iteritems():
@@ -324,19 +325,35 @@ class HomebrewCask(object):
             self.message = 'Invalid cask: {0}.'.format(self.current_cask)
             raise HomebrewCaskException(self.message)
 
+        return self.current_cask in self._cask_inventory()
+    # /checks ------------------------------------------------------ }}}
+
+    # inventory ---------------------------------------------------- {{{
+    def _cask_inventory(self):
+        '''Set of installed casks from a single `brew cask list`, kept until
+        the next install or uninstall.'''
+        if self._installed_casks is not None:
+            return self._installed_casks
+
         cmd = [self.brew_path, 'cask', 'list']
         rc, out, err = self.module.run_command(cmd, path_prefix=self.path[0])
 
         if 'nothing to list' in err:
-            return False
+            self._installed_casks = set()
         elif rc == 0:
-            casks = [cask_.strip() for cask_ in out.split('\n') if cask_.strip()]
-            return self.current_cask in casks
+            self._installed_casks = set(
+                cask_.strip() for cask_ in out.split('\n') if cask_.strip()
+            )
         else:
             self.failed = True
             self.message = err.strip()
             raise HomebrewCaskException(self.message)
-    # /checks ------------------------------------------------------ }}}
+
+        return self._installed_casks
+
+    def _invalidate_inventory(self):
+        self._installed_casks = None
+    # /inventory --------------------------------------------------- }}}
 
     # commands ----------------------------------------------------- {{{
     def _run(self):
@@ -400,6 +417,7 @@ class HomebrewCask(object):
                if opt]
 
         rc, out, err = self.module.run_command(cmd, path_prefix=self.path[0])
+        self._invalidate_inventory()
 
         if self._current_cask_is_installed():
             self.changed_count += 1
@@ -445,6 +463,7 @@ class HomebrewCask(object):
                if opt]
 
         rc, out, err = self.module.run_command(cmd, path_prefix=self.path[0])
+        self._invalidate_inventory()
 
         if not self._current_cask_is_installed():
             self.changed_count += 1
@@ -43,12 +43,23 @@ options:
         required: false
         default: "no"
         choices: [ "yes", "no" ]
+    batch:
+        description:
+            - read the installed ports and their active state once with
+              C(port installed) and install, uninstall, activate or
+              deactivate all the ports that need it with a single port
+              command, instead of one query and one command per port
+        required: false
+        default: "no"
+        choices: [ "yes", "no" ]
+        version_added: "2.1"
 notes:  []
 '''
 EXAMPLES = '''
 - macports: name=foo state=present
 - macports: name=foo state=present update_cache=yes
 - macports: name=foo state=absent
+- macports: name=foo,bar,baz state=present batch=yes
 - macports: name=foo state=active
 - macports: name=foo state=inactive
 '''
@@ -85,9 +96,111 @@ def query_package(module, port_path, name, state="present"):
         return False
 
 
-def remove_packages(module, port_path, packages):
+def query_inventory(module, port_path):
+    """ Returns a dict mapping each installed port to whether any of its
+    installed versions is active, from a single port installed. """
+
+    rc, out, err = module.run_command("%s installed" % port_path)
+    if rc != 0:
+        module.fail_json(msg="could not list installed ports")
+
+    installed = {}
+    for line in out.splitlines():
+        # "  name @version+variants (active)"
+        fields = line.split()
+        if len(fields) < 2 or not fields[1].startswith('@'):
+            continue
+        installed[fields[0]] = installed.get(fields[0], False) or '(active)' in fields[2:]
+
+    return installed
+
+
+def remove_packages_batch(module, port_path, packages):
+    """ Uninstalls all the installed ports with a single port uninstall. """
+
+    inventory = query_inventory(module, port_path)
+    installed = [package for package in packages if package in inventory]
+    if not installed:
+        module.exit_json(changed=False, msg="package(s) already absent")
+
+    rc, out, err = module.run_command("%s uninstall %s" % (port_path, " ".join(installed)))
+
+    inventory = query_inventory(module, port_path)
+    failed = [package for package in installed if package in inventory]
+    if failed:
+        module.fail_json(msg="failed to remove %s: %s" % (" ".join(failed), out))
+
+    module.exit_json(changed=True, msg="removed %s package(s)" % len(installed))
+
+
+def install_packages_batch(module, port_path, packages):
+    """ Installs all the missing ports with a single port install. """
+
+    inventory = query_inventory(module, port_path)
+    missing = [package for package in packages if package not in inventory]
+    if not missing:
+        module.exit_json(changed=False, msg="package(s) already present")
+
+    rc, out, err = module.run_command("%s install %s" % (port_path, " ".join(missing)))
+
+    inventory = query_inventory(module, port_path)
+    failed = [package for package in missing if package not in inventory]
+    if failed:
+        module.fail_json(msg="failed to install %s: %s" % (" ".join(failed), out))
+
+    module.exit_json(changed=True, msg="installed %s package(s)" % len(missing))
+
+
+def activate_packages_batch(module, port_path, packages):
+    """ Activates all the inactive ports with a single port activate. """
+
+    inventory = query_inventory(module, port_path)
+    missing = [package for package in packages if package not in inventory]
+    if missing:
+        module.fail_json(msg="failed to activate %s, package(s) not present" % (" ".join(missing)))
+
+    inactive = [package for package in packages if not inventory[package]]
+    if not inactive:
+        module.exit_json(changed=False, msg="package(s) already active")
+
+    rc, out, err = module.run_command("%s activate %s" % (port_path, " ".join(inactive)))
+
+    inventory = query_inventory(module, port_path)
+    failed = [package for package in inactive if not inventory.get(package)]
+    if failed:
+        module.fail_json(msg="failed to activate %s: %s" % (" ".join(failed), out))
+
+    module.exit_json(changed=True, msg="activated %s package(s)" % len(inactive))
+
+
+def deactivate_packages_batch(module, port_path, packages):
+    """ Deactivates all the active ports with a single port deactivate. """
+
+    inventory = query_inventory(module, port_path)
+    missing = [package for package in packages if package not in inventory]
+    if missing:
+        module.fail_json(msg="failed to deactivate %s, package(s) not present" % (" ".join(missing)))
+
+    active = [package for package in packages if inventory[package]]
+    if not active:
+        module.exit_json(changed=False, msg="package(s) already inactive")
+
+    rc, out, err = module.run_command("%s deactivate %s" % (port_path, " ".join(active)))
+
+    inventory = query_inventory(module, port_path)
+    failed = [package for package in active if inventory.get(package)]
+    if failed:
+        module.fail_json(msg="failed to deactivate %s: %s" % (" ".join(failed), out))
+
+    module.exit_json(changed=True, msg="deactivated %s package(s)" % len(active))
+
+
+def remove_packages(module, port_path, packages, batch=False):
     """ Uninstalls one or more packages if installed. """
 
+    if batch:
+        return remove_packages_batch(module, port_path, packages)
+
     remove_c = 0
     # Using a for loop incase of error, we can report the package that failed
     for package in packages:
@@ -109,9 +222,12 @@ def remove_packages(module, port_path, packages):
     module.exit_json(changed=False, msg="package(s) already absent")
 
 
-def install_packages(module, port_path, packages):
+def install_packages(module, port_path, packages, batch=False):
     """ Installs one or more packages if not already installed. """
 
+    if batch:
+        return install_packages_batch(module, port_path, packages)
+
     install_c = 0
 
     for package in packages:
@@ -131,9 +247,12 @@ def install_packages(module, port_path, packages):
     module.exit_json(changed=False, msg="package(s) already present")
 
 
-def activate_packages(module, port_path, packages):
+def activate_packages(module, port_path, packages, batch=False):
     """ Activate a package if it's inactive. """
 
+    if batch:
+        return activate_packages_batch(module, port_path, packages)
+
     activate_c = 0
 
     for package in packages:
@@ -156,9 +275,12 @@ def activate_packages(module, port_path, packages):
     module.exit_json(changed=False, msg="package(s) already active")
 
 
-def deactivate_packages(module, port_path, packages):
+def deactivate_packages(module, port_path, packages, batch=False):
     """ Deactivate a package if it's active. """
 
+    if batch:
+        return deactivate_packages_batch(module, port_path, packages)
+
     deactivated_c = 0
 
     for package in packages:
@@ -186,7 +308,8 @@ def main():
         argument_spec = dict(
             name = dict(aliases=["pkg"], required=True),
             state = dict(default="present", choices=["present", "installed", "absent", "removed", "active", "inactive"]),
-            update_cache = dict(default="no", aliases=["update-cache"], type='bool')
+            update_cache = dict(default="no", aliases=["update-cache"], type='bool'),
+            batch = dict(default="no", type='bool')
         )
     )
 
@@ -200,16 +323,16 @@ def main():
     pkgs = p["name"].split(",")
 
     if p["state"] in ["present", "installed"]:
-        install_packages(module, port_path, pkgs)
+        install_packages(module, port_path, pkgs, p["batch"])
 
     elif p["state"] in ["absent", "removed"]:
-        remove_packages(module, port_path, pkgs)
+        remove_packages(module, port_path, pkgs, p["batch"])
 
     elif p["state"] == "active":
-        activate_packages(module, port_path, pkgs)
+        activate_packages(module, port_path, pkgs, p["batch"])
 
     elif p["state"] == "inactive":
-        deactivate_packages(module, port_path, pkgs)
+        deactivate_packages(module, port_path, pkgs, p["batch"])
 
 # import module snippets
 from ansible.module_utils.basic import *
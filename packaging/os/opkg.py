@@ -49,6 +49,15 @@ options:
         required: false
         default: "no"
         choices: [ "yes", "no" ]
+    batch:
+        description:
+            - read the installed packages once from the opkg status file and
+              install or remove all the packages that need it with a single
+              opkg command, instead of one query and one command per package
+        required: false
+        default: "no"
+        choices: [ "yes", "no" ]
+        version_added: "2.1"
 notes:  []
 '''
 EXAMPLES = '''
@@ -57,10 +66,13 @@ EXAMPLES = '''
 - opkg: name=foo state=absent
 - opkg: name=foo,bar state=absent
 - opkg: name=foo state=present force=overwrite
+- opkg: name=foo,bar,baz state=present batch=yes
 '''
 
 import pipes
 
+OPKG_STATUS_FILE = '/usr/lib/opkg/status'
+
 def update_package_db(module, opkg_path):
     """ Updates packages list. """
 
@@ -82,7 +94,75 @@ def query_package(module, opkg_path, name, state="present"):
         return False
 
 
-def remove_packages(module, opkg_path, packages):
+def query_inventory(module, opkg_path):
+    """ Returns the set of installed packages, read from the status file or
+    from a single list-installed when the status file cannot be read. """
+
+    try:
+        f = open(OPKG_STATUS_FILE)
+    except IOError:
+        rc, out, err = module.run_command("%s list-installed" % opkg_path)
+        if rc != 0:
+            module.fail_json(msg="could not list installed packages")
+        return set(line.split(' ')[0] for line in out.splitlines() if line.strip())
+
+    try:
+        content = f.read()
+    finally:
+        f.close()
+
+    installed = set()
+    for stanza in content.split('\n\n'):
+        name = None
+        status = []
+        for line in stanza.splitlines():
+            if line.startswith('Package:'):
+                name = line.split(':', 1)[1].strip()
+            elif line.startswith('Status:'):
+                status = line.split(':', 1)[1].split()
+        if name and 'installed' in status and 'not-installed' not in status:
+            installed.add(name)
+
+    return installed
+
+
+def remove_packages_batch(module, opkg_path, packages, force):
+    """ Uninstalls all the installed packages with a single opkg remove. """
+
+    inventory = query_inventory(module, opkg_path)
+    installed = [package for package in packages if package in inventory]
+    if not installed:
+        module.exit_json(changed=False, msg="package(s) already absent")
+
+    rc, out, err = module.run_command("%s remove %s %s" % (opkg_path, force, " ".join(installed)))
+
+    inventory = query_inventory(module, opkg_path)
+    failed = [package for package in installed if package in inventory]
+    if failed:
+        module.fail_json(msg="failed to remove %s: %s" % (" ".join(failed), out))
+
+    module.exit_json(changed=True, msg="removed %s package(s)" % len(installed))
+
+
+def install_packages_batch(module, opkg_path, packages, force):
+    """ Installs all the missing packages with a single opkg install. """
+
+    inventory = query_inventory(module, opkg_path)
+    missing = [package for package in packages if package not in inventory]
+    if not missing:
+        module.exit_json(changed=False, msg="package(s) already present")
+
+    rc, out, err = module.run_command("%s install %s %s" % (opkg_path, force, " ".join(missing)))
+
+    inventory = query_inventory(module, opkg_path)
+    failed = [package for package in missing if package not in inventory]
+    if failed:
+        module.fail_json(msg="failed to install %s: %s" % (" ".join(failed), out))
+
+    module.exit_json(changed=True, msg="installed %s package(s)" % len(missing))
+
+
+def remove_packages(module, opkg_path, packages, batch=False):
     """ Uninstalls one or more packages if installed. """
 
     p = module.params
@@ -90,6 +170,9 @@ def remove_packages(module, opkg_path, packages):
     if force:
         force = "--force-%s" % force
 
+    if batch:
+        return remove_packages_batch(module, opkg_path, packages, force)
+
     remove_c = 0
     # Using a for loop incase of error, we can report the package that failed
     for package in packages:
@@ -111,7 +194,7 @@ def remove_packages(module, opkg_path, packages):
     module.exit_json(changed=False, msg="package(s) already absent")
 
 
-def install_packages(module, opkg_path, packages):
+def install_packages(module, opkg_path, packages, batch=False):
     """ Installs one or more packages if not already installed. """
 
     p = module.params
@@ -119,6 +202,9 @@ def install_packages(module, opkg_path, packages):
     if force:
         force = "--force-%s" % force
 
+    if batch:
+        return install_packages_batch(module, opkg_path, packages, force)
+
     install_c = 0
 
     for package in packages:
@@ -144,7 +230,8 @@ def main():
             name = dict(aliases=["pkg"], required=True),
             state = dict(default="present", choices=["present", "installed", "absent", "removed"]),
             force = dict(default="", choices=["", "depends", "maintainer", "reinstall", "overwrite", "downgrade", "space", "postinstall", "remove", "checksum", "removal-of-dependent-packages"]),
-            update_cache = dict(default="no", aliases=["update-cache"], type='bool')
+            update_cache = dict(default="no", aliases=["update-cache"], type='bool'),
+            batch = dict(default="no", type='bool')
         )
     )
 
@@ -158,10 +245,10 @@ def main():
     pkgs = p["name"].split(",")
 
     if p["state"] in ["present", "installed"]:
-        install_packages(module, opkg_path, pkgs)
+        install_packages(module, opkg_path, pkgs, p["batch"])
 
     elif p["state"] in ["absent", "removed"]:
-        remove_packages(module, opkg_path, pkgs)
+        remove_packages(module, opkg_path, pkgs, p["batch"])
 
 # import module snippets
 from ansible.module_utils.basic import *
@@ -123,6 +123,153 @@ def get_version(pacman_output):
             return line.split(':')[1].strip()
     return None
 
+PACMAN_LOCAL_DB = '/var/lib/pacman/local'
+
+class PackageState(object):
+    """Index of installed and repository package versions, answering
+    query_package() without running pacman for every package.
+
+    The installed set, and the names each package provides, are read in one
+    pass from the desc files of the local database. When the database cannot
+    be read a single `pacman -Q` is used instead, and names it does not list
+    are checked with query_package(). Repository versions come from a single
+    `pacman -Sl`, run only when a query needs them. After packages are
+    installed or removed, call refresh() so the next query sees them; only
+    the database entries that appeared or disappeared are read."""
+
+    def __init__(self, module, pacman_path, local_db=PACMAN_LOCAL_DB):
+        self.module = module
+        self.pacman_path = pacman_path
+        self.local_db = local_db
+        self._entries = None
+        self._installed = None
+        self._provides = None
+        self._repo = None
+
+    @property
+    def installed(self):
+        if self._installed is None:
+            self._load()
+        return self._installed
+
+    @property
+    def repo(self):
+        if self._repo is None:
+            self._repo = self._read_sync_list()
+        return self._repo
+
+    def refresh(self):
+        if self._entries is None:
+            # no local database, pacman -Q has to be run again
+            self._installed = None
+        elif self._scan_local_db():
+            self._index_entries()
+
+    def query(self, name, remote=True):
+        """Same answer as query_package(): installed, up-to-date and whether
+        the repository version was unavailable. With remote=False the
+        repository is not consulted and installed packages count as
+        up-to-date"""
+        installed = self.installed
+        if name not in installed:
+            if self._provides is None:
+                return query_package(self.module, self.pacman_path, name)
+            if name not in self._provides:
+                return False, False, False
+            # like pacman -Qi, a provided name answers for its provider
+            name = self._provides[name]
+        if not remote:
+            return True, True, False
+        if name not in self.repo:
+            return True, True, True
+        return True, (installed[name] == self.repo[name]), False
+
+    def _load(self):
+        self._entries = {}
+        if self._scan_local_db():
+            self._index_entries()
+        else:
+            self._entries = None
+            self._installed = self._read_query()
+
+    def _scan_local_db(self):
+        """Bring the desc entries up to date with the local database,
+        reading only the directories that are new since the last scan"""
+        try:
+            entries = set(os.listdir(self.local_db))
+        except OSError:
+            return False
+
+        for entry in set(self._entries) - entries:
+            del self._entries[entry]
+
+        for entry in entries - set(self._entries):
+            desc = os.path.join(self.local_db, entry, 'desc')
+            try:
+                f = open(desc)
+            except IOError:
+                continue
+            try:
+                fields = parse_desc(f.read())
+            finally:
+                f.close()
+            if 'NAME' in fields and 'VERSION' in fields:
+                self._entries[entry] = fields
+        return True
+
+    def _index_entries(self):
+        self._installed = {}
+        self._provides = {}
+        for fields in self._entries.values():
+            name = fields['NAME'][0]
+            self._installed[name] = fields['VERSION'][0]
+            for provided in fields.get('PROVIDES', []):
+                # drop the version of "name=1.0" provides
+                self._provides.setdefault(provided.split('=')[0], name)
+
+    def _read_query(self):
+        cmd = "%s -Q" % (self.pacman_path)
+        rc, stdout, stderr = self.module.run_command(cmd, check_rc=False)
+        if rc != 0:
+            self.module.fail_json(msg="could not list installed packages")
+
+        installed = {}
+        for line in stdout.splitlines():
+            fields = line.split()
+            if len(fields) >= 2:
+                installed[fields[0]] = fields[1]
+        return installed
+
+    def _read_sync_list(self):
+        cmd = "%s -Sl" % (self.pacman_path)
+        rc, stdout, stderr = self.module.run_command(cmd, check_rc=False)
+
+        repo = {}
+        if rc != 0:
+            return repo
+        for line in stdout.splitlines():
+            # repository name version [installed]
+            fields = line.split()
+            # the first repository listing a package takes precedence
+            if len(fields) >= 3 and fields[1] not in repo:
+                repo[fields[1]] = fields[2]
+        return repo
+
+def parse_desc(content):
+    """Take the content of a local database desc file and return a dict of
+    its %FIELD% sections, each mapped to the list of its values"""
+    fields = {}
+    key = None
+    for line in content.split('\n'):
+        line = line.strip()
+        if line.startswith('%') and line.endswith('%') and len(line) > 2:
+            key = line[1:-1]
+        elif key and line:
+            fields.setdefault(key, []).append(line)
+        elif not line:
+            key = None
+    return fields
+
 def query_package(module, pacman_path, name, state="present"):
     """Query the package status in both the local system and the repository. Returns a boolean to indicate if the package is installed, a second boolean to indicate if the package is up-to-date and a third boolean to indicate whether online information were available"""
     if state == "present":
@@ -181,7 +328,7 @@ def remove_packages(module, pacman_path, packages):
     else:
         args = "R"
 
-def remove_packages(module, pacman_path, packages):
+def remove_packages(module, pacman_path, packages, pkg_state):
     if module.params["force"]:
         args = "Rdd"
     else:
@@ -191,7 +338,7 @@ def remove_packages(module, pacman_path, packages):
     # Using a for loop incase of error, we can report the package that failed
     for package in packages:
         # Query the package first, to see if we even need to remove
-        installed, updated, unknown = query_package(module, pacman_path, package)
+        installed, updated, unknown = pkg_state.query(package, remote=False)
         if not installed:
             continue
 
@@ -201,6 +348,7 @@ def remove_packages(module, pacman_path, packages):
         if rc != 0:
             module.fail_json(msg="failed to remove %s" % (package))
 
+        pkg_state.refresh()
         remove_c += 1
 
     if remove_c > 0:
@@ -210,14 +358,14 @@ def remove_packages(module, pacman_path, packages):
     module.exit_json(changed=False, msg="package(s) already absent")
 
 
-def install_packages(module, pacman_path, state, packages, package_files):
+def install_packages(module, pacman_path, state, packages, package_files, pkg_state):
     install_c = 0
     package_err = []
     message = ""
 
     for i, package in enumerate(packages):
         # if the package is installed and state == present or state == latest and is up-to-date then skip
-        installed, updated, latestError = query_package(module, pacman_path, package)
+        installed, updated, latestError = pkg_state.query(package, remote=(state == 'latest'))
         if latestError and state == 'latest':
             package_err.append(package)
             
@@ -235,6 +383,7 @@ def install_packages(module, pacman_path, state, packages, package_files):
         if rc != 0:
             module.fail_json(msg="failed to install %s" % (package))
 
+        pkg_state.refresh()
         install_c += 1
     
     if state == 'latest' and len(package_err) > 0:
@@ -245,10 +394,10 @@ def install_packages(module, pacman_path, state, packages, package_files):
         
     module.exit_json(changed=False, msg="package(s) already installed. %s" % (message))
     
-def check_packages(module, pacman_path, packages, state):
+def check_packages(module, pacman_path, packages, state, pkg_state):
     would_be_changed = []
     for package in packages:
-        installed, updated, unknown = query_package(module, pacman_path, package)
+        installed, updated, unknown = pkg_state.query(package, remote=(state == 'latest'))
         if ((state in ["present", "latest"] and not installed) or
                 (state == "absent" and installed) or
                 (state == "latest" and not updated)):
@@ -312,13 +461,15 @@ def main():
             else:
                 pkg_files.append(None)
 
+        pkg_state = PackageState(module, pacman_path)
+
         if module.check_mode:
-            check_packages(module, pacman_path, pkgs, p['state'])
+            check_packages(module, pacman_path, pkgs, p['state'], pkg_state)
 
         if p['state'] in ['present', 'latest']:
-            install_packages(module, pacman_path, p['state'], pkgs, pkg_files)
+            install_packages(module, pacman_path, p['state'], pkgs, pkg_files, pkg_state)
         elif p['state'] == 'absent':
-            remove_packages(module, pacman_path, pkgs)
+            remove_packages(module, pacman_path, pkgs, pkg_state)
 
 # import module snippets
 from ansible.module_utils.basic import *
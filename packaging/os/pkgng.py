@@ -68,6 +68,16 @@ options:
             - for pkgng versions 1.5 and later, pkg will install all packages
               within the specified root directory
         required: false
+    batch:
+        description:
+            - read the installed packages with a single C(pkg query) and
+              install or remove all the packages that need it in a single
+              C(pkg) transaction, instead of one query and one transaction
+              per package
+        choices: [ 'yes', 'no' ]
+        required: false
+        default: no
+        version_added: "2.1"
 author: "bleader (@bleader)" 
 notes:
     - When using pkgsite, be careful that already in cache packages won't be downloaded again.
@@ -82,9 +92,13 @@ EXAMPLES = '''
 
 # Remove packages foo and bar 
 - pkgng: name=foo,bar state=absent
+
+# Install packages foo, bar and baz in a single transaction
+- pkgng: name=foo,bar,baz state=present batch=yes
 '''
 
 
+import fnmatch
 import json
 import shlex
 import os
@@ -100,6 +114,31 @@ def query_package(module, pkgng_path, name, rootdir_arg):
 
     return False
 
+def query_inventory(module, pkgng_path, rootdir_arg):
+    """ Returns the names and name-version strings of every installed package. """
+
+    rc, out, err = module.run_command("%s %s query '%%n %%v'" % (pkgng_path, rootdir_arg))
+    if rc != 0:
+        module.fail_json(msg="could not list installed packages", stderr=err)
+
+    inventory = set()
+    for line in out.splitlines():
+        fields = line.split()
+        if len(fields) == 2:
+            inventory.add(fields[0])
+            inventory.add("%s-%s" % (fields[0], fields[1]))
+
+    return inventory
+
+def package_in_inventory(package, inventory):
+    """ Same match as query_package(), which passes the name to pkg as a glob. """
+
+    if package in inventory:
+        return True
+    if re.search(r'[*?\[]', package):
+        return len(fnmatch.filter(inventory, package)) > 0
+    return False
+
 def pkgng_older_than(module, pkgng_path, compare_version):
 
     rc, out, err = module.run_command("%s -v" % pkgng_path)
@@ -117,8 +156,11 @@ def pkgng_older_than(module, pkgng_path, compare_version):
     return not new_pkgng
 
 
-def remove_packages(module, pkgng_path, packages, rootdir_arg):
-    
+def remove_packages(module, pkgng_path, packages, rootdir_arg, batch=False):
+
+    if batch:
+        return remove_packages_batch(module, pkgng_path, packages, rootdir_arg)
+
     remove_c = 0
     # Using a for loop incase of error, we can report the package that failed
     for package in packages:
@@ -141,7 +183,25 @@ def remove_packages(module, pkgng_path, packages, rootdir_arg):
     return (False, "package(s) already absent")
 
 
-def install_packages(module, pkgng_path, packages, cached, pkgsite, rootdir_arg):
+def remove_packages_batch(module, pkgng_path, packages, rootdir_arg):
+
+    inventory = query_inventory(module, pkgng_path, rootdir_arg)
+    installed = [package for package in packages if package_in_inventory(package, inventory)]
+    if not installed:
+        return (False, "package(s) already absent")
+
+    if not module.check_mode:
+        rc, out, err = module.run_command("%s %s delete -y %s" % (pkgng_path, rootdir_arg, " ".join(installed)))
+
+        inventory = query_inventory(module, pkgng_path, rootdir_arg)
+        failed = [package for package in installed if package_in_inventory(package, inventory)]
+        if failed:
+            module.fail_json(msg="failed to remove %s: %s" % (" ".join(failed), out), stderr=err)
+
+    return (True, "removed %s package(s)" % len(installed))
+
+
+def install_packages(module, pkgng_path, packages, cached, pkgsite, rootdir_arg, batch=False):
 
     install_c = 0
 
@@ -165,6 +225,9 @@ def install_packages(module, pkgng_path, packages, cached, pkgsite, rootdir_arg)
         if rc != 0:
             module.fail_json(msg="Could not update catalogue")
 
+    if batch:
+        return install_packages_batch(module, pkgng_path, packages, pkgsite, rootdir_arg, old_pkgng, batch_var)
+
     for package in packages:
         if query_package(module, pkgng_path, package, rootdir_arg):
             continue
@@ -185,6 +248,27 @@ def install_packages(module, pkgng_path, packages, cached, pkgsite, rootdir_arg)
 
     return (False, "package(s) already present")
 
+def install_packages_batch(module, pkgng_path, packages, pkgsite, rootdir_arg, old_pkgng, batch_var):
+
+    inventory = query_inventory(module, pkgng_path, rootdir_arg)
+    missing = [package for package in packages if not package_in_inventory(package, inventory)]
+    if not missing:
+        return (False, "package(s) already present")
+
+    if not module.check_mode:
+        names = " ".join(missing)
+        if old_pkgng:
+            rc, out, err = module.run_command("%s %s %s install -g -U -y %s" % (batch_var, pkgsite, pkgng_path, names))
+        else:
+            rc, out, err = module.run_command("%s %s %s install %s -g -U -y %s" % (batch_var, pkgng_path, rootdir_arg, pkgsite, names))
+
+        inventory = query_inventory(module, pkgng_path, rootdir_arg)
+        failed = [package for package in missing if not package_in_inventory(package, inventory)]
+        if failed:
+            module.fail_json(msg="failed to install %s: %s" % (" ".join(failed), out), stderr=err)
+
+    return (True, "added %s package(s)" % len(missing))
+
 def annotation_query(module, pkgng_path, package, tag, rootdir_arg):
     rc, out, err = module.run_command("%s %s info -g -A %s" % (pkgng_path, rootdir_arg, package))
     match = re.search(r'^\s*(?P<tag>%s)\s*:\s*(?P<value>\w+)' % tag, out, flags=re.MULTILINE)
@@ -272,7 +356,8 @@ def main():
                 cached          = dict(default=False, type='bool'),
                 annotation      = dict(default="", required=False),
                 pkgsite         = dict(default="", required=False),
-                rootdir         = dict(default="", required=False)),
+                rootdir         = dict(default="", required=False),
+                batch           = dict(default=False, type='bool')),
             supports_check_mode = True)
 
     pkgng_path = module.get_bin_path('pkg', True)
@@ -293,12 +378,12 @@ def main():
             rootdir_arg = "--rootdir %s" % (p["rootdir"])
 
     if p["state"] == "present":
-        _changed, _msg = install_packages(module, pkgng_path, pkgs, p["cached"], p["pkgsite"], rootdir_arg)
+        _changed, _msg = install_packages(module, pkgng_path, pkgs, p["cached"], p["pkgsite"], rootdir_arg, p["batch"])
         changed = changed or _changed
         msgs.append(_msg)
 
     elif p["state"] == "absent":
-        _changed, _msg = remove_packages(module, pkgng_path, pkgs, rootdir_arg)
+        _changed, _msg = remove_packages(module, pkgng_path, pkgs, rootdir_arg, p["batch"])
         changed = changed or _changed
         msgs.append(_msg)
 
@@ -56,6 +56,7 @@ options:
       - the state of the project.
         C(query) will only gather facts,
         C(present) will create the project I(root) folder, and in it the I(releases) and I(shared) folders,
+          and stage I(stage_src) into the new release folder when it is set,
         C(finalize) will remove the unfinished_filename file, create a symlink to the newly
           deployed release and optionally clean old releases,
         C(clean) will remove failed & old releases,
@@ -112,6 +113,56 @@ options:
       - the number of old releases to keep when cleaning. Used in C(finalize) and C(clean). Any unfinished builds
         will be deleted first, so only correct releases will count. The current version will not count.
 
+  cleanup_mode:
+    required: False
+    default: sync
+    choices: [ sync, parallel, trash ]
+    version_added: "2.1"
+    description:
+      - how old and unfinished releases are removed during cleaning.
+        C(sync) deletes them one after the other,
+        C(parallel) deletes them at the same time with I(cleanup_workers) threads,
+        C(trash) renames them into a C(.trash) folder inside I(releases_path) and deletes the contents of that
+          folder in a background process, so the module returns as soon as the renames are done.
+
+  cleanup_workers:
+    required: False
+    default: 4
+    version_added: "2.1"
+    description:
+      - the number of releases deleted at the same time when C(cleanup_mode=parallel).
+
+  stage_src:
+    required: False
+    default: None
+    version_added: "2.1"
+    description:
+      - a folder with a complete build of the application to stage as the new release during C(state=present).
+        Files are copied to I(new_release_path), except files whose content is unchanged since the previous release
+        (the target of the I(current_path) symlink), which are linked from that release instead.
+        The I(unfinished_filename) file is created in the new release, and a I(manifest_filename) file recording the
+        sha1 of every file is written so the next release can be staged the same way.
+        Nothing is done if the new release already has a manifest.
+
+  stage_link:
+    required: False
+    default: hardlink
+    choices: [ hardlink, reflink ]
+    version_added: "2.1"
+    description:
+      - how unchanged files are taken from the previous release when staging.
+        C(hardlink) shares the file with the previous release, so staged files must be replaced rather than
+          modified in place,
+        C(reflink) makes a copy-on-write clone with C(cp --reflink=always) and needs a filesystem that supports it.
+        Files that cannot be linked, for example because the previous release is on another filesystem, are copied.
+
+  manifest_filename:
+    required: False
+    default: DEPLOY_MANIFEST
+    version_added: "2.1"
+    description:
+      - the name of the file in each staged release that holds its content manifest.
+
 notes:
   - Facts are only returned for C(state=query) and C(state=present). If you use both, you should pass any overridden
     parameters to both calls, otherwise the second call will overwrite the facts of the first one.
@@ -218,6 +269,13 @@ procedure to remove it during cleanup.
 # Or, if you use 'clean=false' on finalize:
 - deploy_helper: path=/path/to/root state=clean keep_releases=10
 
+# Moving old releases out of the way and deleting them in the background:
+- deploy_helper: path=/path/to/root release={{ deploy_helper.new_release }} state=finalize cleanup_mode=trash
+
+# Staging a build, linking the files that did not change since the current release:
+- deploy_helper: path=/path/to/root stage_src=/tmp/build/{{ build_id }}
+- deploy_helper: path=/path/to/root release={{ deploy_helper.new_release }} state=finalize
+
 # Removing the entire project root folder
 - deploy_helper: path=/path/to/root state=absent
 
@@ -227,6 +285,27 @@ procedure to remove it during cleanup.
 
 '''
 
+import hashlib
+try:
+    import json
+except ImportError:
+    import simplejson as json
+import os
+import stat
+import subprocess
+import threading
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+# Folder inside releases_path that holds releases waiting to be purged
+TRASH_DIRNAME = '.trash'
+
 class DeployHelper(object):
 
     def __init__(self, module):
@@ -236,12 +315,17 @@ class DeployHelper(object):
         self.file_args = module.load_file_common_arguments(module.params)
 
         self.clean               = module.params['clean']
+        self.cleanup_mode        = module.params['cleanup_mode']
+        self.cleanup_workers     = module.params['cleanup_workers']
         self.current_path        = module.params['current_path']
         self.keep_releases       = module.params['keep_releases']
+        self.manifest_filename   = module.params['manifest_filename']
         self.path                = module.params['path']
         self.release             = module.params['release']
         self.releases_path       = module.params['releases_path']
         self.shared_path         = module.params['shared_path']
+        self.stage_link          = module.params['stage_link']
+        self.stage_src           = module.params['stage_src']
         self.state               = module.params['state']
         self.unfinished_filename = module.params['unfinished_filename']
 
@@ -342,17 +426,105 @@ class DeployHelper(object):
 
         return changed
 
-    def remove_unfinished_builds(self, releases_path):
+    def delete_paths(self, paths):
+        """ Delete several release folders at the same time. """
+        for path in paths:
+            if not os.path.isdir(path):
+                self.module.fail_json(msg="%s exists but is not a directory" % path)
+
+        pending = list(paths)
+        errors = []
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                lock.acquire()
+                try:
+                    if not pending:
+                        return
+                    path = pending.pop()
+                finally:
+                    lock.release()
+                try:
+                    shutil.rmtree(path, ignore_errors=False)
+                except Exception, e:
+                    lock.acquire()
+                    errors.append("%s: %s" % (path, str(e)))
+                    lock.release()
+
+        threads = []
+        for i in range(min(self.cleanup_workers, len(paths))):
+            thread = threading.Thread(target=worker)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            self.module.fail_json(msg="rmtree failed: %s" % ', '.join(errors))
+
+        return len(paths)
+
+    def trash_paths(self, releases_path, paths):
+        """ Move release folders into the trash folder, to be purged later. """
+        trash_path = os.path.join(releases_path, TRASH_DIRNAME)
+        if not os.path.isdir(trash_path):
+            os.makedirs(trash_path)
+
+        suffix = time.strftime("%Y%m%d%H%M%S")
+        for path in paths:
+            if not os.path.isdir(path):
+                self.module.fail_json(msg="%s exists but is not a directory" % path)
+            try:
+                os.rename(path, os.path.join(trash_path, "%s.%s.%d" % (os.path.basename(path), suffix, os.getpid())))
+            except OSError, e:
+                self.module.fail_json(msg="moving %s to %s failed: %s" % (path, trash_path, str(e)))
+
+        return len(paths)
+
+    def purge_trash(self, releases_path):
+        """ Delete the contents of the trash folder in a detached process. """
+        trash_path = os.path.join(releases_path, TRASH_DIRNAME)
+        if self.module.check_mode or not os.path.isdir(trash_path):
+            return
+
+        entries = [os.path.join(trash_path, f) for f in os.listdir(trash_path)]
+        if not entries:
+            return
+
+        devnull = open(os.devnull, 'r+')
+        try:
+            subprocess.Popen(['rm', '-rf', '--'] + entries, stdin=devnull, stdout=devnull, stderr=devnull,
+                             close_fds=True, preexec_fn=os.setsid)
+        finally:
+            devnull.close()
+
+    def remove_releases(self, releases_path, paths):
+        if not paths:
+            return 0
+        if self.cleanup_mode == 'parallel':
+            return self.delete_paths(paths)
+        elif self.cleanup_mode == 'trash':
+            return self.trash_paths(releases_path, paths)
+
         changes = 0
+        for path in paths:
+            changes += self.delete_path(path)
+        return changes
+
+    def remove_unfinished_builds(self, releases_path):
+        unfinished = []
 
         for release in os.listdir(releases_path):
+            if release == TRASH_DIRNAME:
+                continue
             if os.path.isfile(os.path.join(releases_path, release, self.unfinished_filename)):
-                if self.module.check_mode:
-                    changes += 1
-                else:
-                    changes += self.delete_path(os.path.join(releases_path, release))
+                unfinished.append(os.path.join(releases_path, release))
 
-        return changes
+        if self.module.check_mode:
+            return len(unfinished)
+
+        return self.remove_releases(releases_path, unfinished)
 
     def remove_unfinished_link(self, path):
         changed = False
@@ -368,21 +540,172 @@ class DeployHelper(object):
         changes = 0
 
         if os.path.lexists(releases_path):
-            releases = [ f for f in os.listdir(releases_path) if os.path.isdir(os.path.join(releases_path,f)) ]
-            try:
-                releases.remove(reserve_version)
-            except ValueError:
-                pass
+            releases = self._scan_releases(releases_path)
+            releases.pop(reserve_version, None)
 
             if not self.module.check_mode:
-                releases.sort( key=lambda x: os.path.getctime(os.path.join(releases_path,x)), reverse=True)
-                for release in releases[self.keep_releases:]:
-                    changes += self.delete_path(os.path.join(releases_path, release))
+                ordered = sorted(releases, key=releases.get, reverse=True)
+                expired = [ os.path.join(releases_path, release) for release in ordered[self.keep_releases:] ]
+                changes += self.remove_releases(releases_path, expired)
             elif len(releases) > self.keep_releases:
                 changes += (len(releases) - self.keep_releases)
 
+            if self.cleanup_mode == 'trash':
+                self.purge_trash(releases_path)
+
         return changes
 
+    def _scan_releases(self, releases_path):
+        """ Return a dict of release folder name to ctime, from a single pass over releases_path. """
+        releases = {}
+
+        if scandir is not None:
+            for entry in scandir(releases_path):
+                if entry.name != TRASH_DIRNAME and entry.is_dir():
+                    releases[entry.name] = entry.stat().st_ctime
+            return releases
+
+        for name in os.listdir(releases_path):
+            if name == TRASH_DIRNAME:
+                continue
+            try:
+                st = os.stat(os.path.join(releases_path, name))
+            except OSError:
+                continue
+            if stat.S_ISDIR(st.st_mode):
+                releases[name] = st.st_ctime
+
+        return releases
+
+    def stage_release(self, src, new_release_path, previous_release_path):
+        """ Fill new_release_path with the content of src.
+
+        Files listed in the manifest of the previous release with the same
+        sha1 are linked from there, everything else is copied. Returns the
+        number of linked and copied files, or None if the release had
+        already been staged. """
+        if not os.path.isdir(src):
+            self.module.fail_json(msg="%s is not a directory" % src)
+
+        manifest_path = os.path.join(new_release_path, self.manifest_filename)
+        if os.path.exists(manifest_path):
+            return None
+
+        if os.path.lexists(new_release_path):
+            if not os.path.isdir(new_release_path):
+                self.module.fail_json(msg="%s exists but is not a directory" % new_release_path)
+            if [f for f in os.listdir(new_release_path) if f != self.unfinished_filename]:
+                self.module.fail_json(msg="%s already exists and is not empty" % new_release_path)
+
+        if self.module.check_mode:
+            return 0, 0
+
+        previous = {}
+        if previous_release_path and os.path.normpath(previous_release_path) != os.path.normpath(new_release_path):
+            previous = self._read_manifest(previous_release_path)
+
+        manifest = {}
+        linked = 0
+        copied = 0
+
+        for root, dirs, files in os.walk(src):
+            rel_root = os.path.relpath(root, src)
+            dest_root = os.path.normpath(os.path.join(new_release_path, rel_root))
+            if not os.path.isdir(dest_root):
+                os.makedirs(dest_root)
+            shutil.copymode(root, dest_root)
+
+            for name in dirs + files:
+                src_path = os.path.join(root, name)
+                dest_path = os.path.join(dest_root, name)
+                rel_path = os.path.normpath(os.path.join(rel_root, name))
+
+                if os.path.islink(src_path):
+                    os.symlink(os.readlink(src_path), dest_path)
+                    continue
+                if name in dirs:
+                    continue
+                if rel_path in (self.manifest_filename, self.unfinished_filename):
+                    continue
+
+                src_stat = os.stat(src_path)
+                digest = self._sha1(src_path)
+                entry = previous.get(rel_path)
+                if entry and entry['sha1'] == digest and \
+                        self._link_release_file(os.path.join(previous_release_path, rel_path), dest_path,
+                                                entry, src_stat):
+                    linked += 1
+                else:
+                    shutil.copy2(src_path, dest_path)
+                    copied += 1
+
+                dest_stat = os.stat(dest_path)
+                manifest[rel_path] = {
+                    'sha1':  digest,
+                    'size':  dest_stat.st_size,
+                    'mtime': dest_stat.st_mtime,
+                    'mode':  stat.S_IMODE(dest_stat.st_mode),
+                }
+
+        f = open(manifest_path, 'w')
+        try:
+            json.dump(manifest, f)
+        finally:
+            f.close()
+        open(os.path.join(new_release_path, self.unfinished_filename), 'a').close()
+
+        return linked, copied
+
+    def _link_release_file(self, previous_path, dest_path, entry, src_stat):
+        # Only trust the manifest if the file was not touched since it was written
+        try:
+            previous_stat = os.lstat(previous_path)
+        except OSError:
+            return False
+        if not stat.S_ISREG(previous_stat.st_mode) or previous_stat.st_size != entry['size'] or \
+                previous_stat.st_mtime != entry['mtime']:
+            return False
+
+        if self.stage_link == 'reflink':
+            rc, out, err = self.module.run_command(['cp', '--reflink=always', previous_path, dest_path])
+            if rc != 0:
+                return False
+            shutil.copystat(previous_path, dest_path)
+            os.chmod(dest_path, stat.S_IMODE(src_stat.st_mode))
+            return True
+
+        # A hardlink shares its permissions with the previous release
+        if stat.S_IMODE(previous_stat.st_mode) != stat.S_IMODE(src_stat.st_mode):
+            return False
+        try:
+            os.link(previous_path, dest_path)
+        except OSError:
+            return False
+        return True
+
+    def _read_manifest(self, release_path):
+        try:
+            f = open(os.path.join(release_path, self.manifest_filename))
+        except IOError:
+            return {}
+        try:
+            try:
+                return json.load(f)
+            except ValueError:
+                return {}
+        finally:
+            f.close()
+
+    def _sha1(self, path):
+        digest = hashlib.sha1()
+        f = open(path, 'rb')
+        try:
+            for chunk in iter(lambda: f.read(1024 * 1024), ''):
+                digest.update(chunk)
+        finally:
+            f.close()
+        return digest.hexdigest()
+
     def _get_file_args(self, path):
         file_args = self.file_args.copy()
         file_args['path'] = path
@@ -410,6 +733,11 @@ def main():
             keep_releases       = dict(required=False, type='int', default=5),
             clean               = dict(required=False, type='bool', default=True),
             unfinished_filename = dict(required=False, type='str', default='DEPLOY_UNFINISHED'),
+            cleanup_mode        = dict(required=False, choices=['sync', 'parallel', 'trash'], default='sync'),
+            cleanup_workers     = dict(required=False, type='int', default=4),
+            stage_src           = dict(required=False, type='path', default=None),
+            stage_link          = dict(required=False, choices=['hardlink', 'reflink'], default='hardlink'),
+            manifest_filename   = dict(required=False, type='str', default='DEPLOY_MANIFEST'),
             state               = dict(required=False, choices=['present', 'absent', 'clean', 'finalize', 'query'], default='present')
         ),
         add_file_common_args = True,
@@ -419,6 +747,9 @@ def main():
     deploy_helper = DeployHelper(module)
     facts  = deploy_helper.gather_facts()
 
+    if deploy_helper.cleanup_workers < 1:
+        module.fail_json(msg="'cleanup_workers' should be at least 1")
+
     result = {
         'state': deploy_helper.state
     }
@@ -434,6 +765,12 @@ def main():
         changes += deploy_helper.create_path(facts['releases_path'])
         if deploy_helper.shared_path:
             changes += deploy_helper.create_path(facts['shared_path'])
+        if deploy_helper.stage_src:
+            staged = deploy_helper.stage_release(deploy_helper.stage_src, facts['new_release_path'],
+                                                 facts['previous_release_path'])
+            if staged is not None:
+                changes += 1
+                result['linked_files'], result['copied_files'] = staged
 
         result['ansible_facts'] = { 'deploy_helper': facts }
 
@@ -446,12 +783,12 @@ def main():
         changes += deploy_helper.remove_unfinished_file(facts['new_release_path'])
         changes += deploy_helper.create_link(facts['new_release_path'], facts['current_path'])
         if deploy_helper.clean:
-            changes += deploy_helper.remove_unfinished_link(facts['path'])
+            changes += deploy_helper.remove_unfinished_link(facts['project_path'])
             changes += deploy_helper.remove_unfinished_builds(facts['releases_path'])
             changes += deploy_helper.cleanup(facts['releases_path'], facts['new_release'])
 
     elif deploy_helper.state == 'clean':
-        changes += deploy_helper.remove_unfinished_link(facts['path'])
+        changes += deploy_helper.remove_unfinished_link(facts['project_path'])
         changes += deploy_helper.remove_unfinished_builds(facts['releases_path'])
         changes += deploy_helper.cleanup(facts['releases_path'], facts['new_release'])
 